@@ -1,24 +1,34 @@
 # backend/app/auth.py
 
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 
+from .cache import TTLCache
 from .config import settings
-from .database import get_db
+from .database import get_async_db, get_db, set_request_user
 from . import models, schemas
 
 # ---------------------------------------------------
 # PASSWORD HASHING (Argon2)
 # ---------------------------------------------------
+# Cost parameters come from settings. Hashes made with other parameters
+# still verify, and are flagged for a rehash on the next successful login.
 pwd_context = CryptContext(
     schemes=["argon2"],
-    deprecated="auto"
+    deprecated="auto",
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
 )
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -35,6 +45,51 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """(valid, new_hash) — new_hash is set when the stored hash uses outdated parameters."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# ---------------------------------------------------
+# OFFLOADED HASHING
+# ---------------------------------------------------
+# Argon2 is deliberately slow and memory hungry. Running it on its own small
+# pool keeps a burst of logins from occupying the shared threadpool that
+# every sync route depends on.
+_hash_executor: Executor | None = None
+
+
+def get_hash_executor() -> Executor:
+    global _hash_executor
+    if _hash_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="argon2"
+            )
+    return _hash_executor
+
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+async def aget_password_hash(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), get_password_hash, password)
+
+
+async def averify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_hash_executor(), verify_and_update, plain_password, hashed_password
+    )
+
+
 # ---------------------------------------------------
 # JWT CREATION (sub MUST be string)
 # ---------------------------------------------------
@@ -58,19 +113,54 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 
 # ---------------------------------------------------
-# GET CURRENT USER
+# RESOLVED-PRINCIPAL CACHE
 # ---------------------------------------------------
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> models.User:
+# token -> (user_id, token expiry, user generation). A hit skips both
+# jwt.decode and the users lookup. Bumping a user's generation through
+# `invalidate_user` makes all of their cached tokens miss again.
+principal_cache = TTLCache(
+    maxsize=settings.AUTH_CACHE_SIZE,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+)
+
+_user_generations: dict[int, int] = {}
+_generations_lock = threading.Lock()
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop every cached principal of this user (e.g. after deletion or a password change)."""
+    with _generations_lock:
+        _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+
 
-    credentials_exception = HTTPException(
+# ---------------------------------------------------
+# GET CURRENT USER
+# ---------------------------------------------------
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+async def get_current_user_id(
+    token: str = Depends(oauth2_scheme),
+    db = Depends(get_async_db),
+) -> int:
+    """
+    Resolve the token to a user id. Cached, so routes that only need the id
+    usually make no DB round-trip at all.
+    """
+    cached = principal_cache.get(token)
+    if cached is not None:
+        user_id, expires_at, generation = cached
+        if expires_at > datetime.utcnow().timestamp() and generation == _user_generations.get(user_id, 0):
+            set_request_user(user_id)
+            return user_id
+
+    credentials_exception = _credentials_exception()
+
     try:
         payload = jwt.decode(
             token,
@@ -88,8 +178,23 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if user is None:
+    generation = _user_generations.get(user_id, 0)
+
+    exists = await db.scalar(select(models.User.id).where(models.User.id == user_id))
+    if exists is None:
         raise credentials_exception
 
+    principal_cache.set(token, (user_id, payload["exp"], generation))
+    set_request_user(user_id)
+    return user_id
+
+
+def get_current_user(
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+) -> models.User:
+    user = db.get(models.User, user_id)
+    if user is None:
+        raise _credentials_exception()
+
     return user
@@ -0,0 +1,240 @@
+# backend/app/blocks.py
+#
+# Parsing of LLM output into plain text and into a compact block
+# structure the exporters render directly:
+#
+#   ["h", "Heading"]            ["p", "Paragraph text"]
+#   ["ul", ["item", "item"]]    ["ol", ["item", "item"]]
+#
+# Cleaning keeps structure in a plain-text form: headings become "# Heading",
+# bullets "- item", numbered items "1. item", and inline markup (*, _, #) is
+# dropped. parse_blocks gives the same blocks for the raw and the cleaned
+# text (benchmarks/check_blocks.py checks this). Section.content holds the
+# cleaned text; Section.blocks is parsed from it whenever content is set
+# (see models.Section).
+import re
+
+_INLINE_MARKUP = str.maketrans("", "", "*_#")
+
+# "#" headings and "*" bullets only exist before inline markup is dropped.
+# Markers need whitespace after them, so "**bold**" or "#hashtag" are inline
+# markup, not structure.
+_RAW_MARKER = re.compile(r"(?:(?P<heading>#{1,6})|\*)\s")
+_RAW_MARKER_START = frozenset("#*")
+
+# List markers are matched once inline markup is gone, so "**1.** Intro" is
+# a numbered item too
+_LIST_MARKER = re.compile(r"(?:(?P<bullet>[-+•])|(?P<number>\d{1,3})[.)])\s")
+_LIST_MARKER_START = frozenset("-+•0123456789")
+
+# Line starts that can still turn into a marker once more text arrives
+_PARTIAL_RAW_MARKER = re.compile(r"#{1,6}|\*")
+_PARTIAL_LIST_MARKER = re.compile(r"[-+•]|\d{1,3}[.)]?")
+
+
+def _drop_markup(text: str) -> str:
+    # str.translate builds a lookup cache on every call, which costs more
+    # than scanning a short string for the three characters first
+    if "*" in text or "_" in text or "#" in text:
+        return text.translate(_INLINE_MARKUP)
+    return text
+
+
+def _lines(text: str):
+    """
+    (kind, number, text) for each line; kind is h, ul, ol or p, and text is
+    empty for blank lines. Markup is dropped from the whole text in one
+    translate, and only lines starting with a marker character look further.
+    """
+    for raw, line in zip(text.split("\n"), text.translate(_INLINE_MARKUP).split("\n")):
+        body = line.strip()
+        if not body:
+            yield "p", "", ""
+            continue
+
+        head = raw.lstrip()
+        if head[0] in _RAW_MARKER_START and _RAW_MARKER.match(head):
+            yield "h" if head[0] == "#" else "ul", "", body
+            continue
+
+        if body[0] in _LIST_MARKER_START:
+            line = line.lstrip()
+            m = _LIST_MARKER.match(line)
+            if m:
+                yield "ul" if m["bullet"] else "ol", m["number"] or "", line[m.end():].strip()
+                continue
+
+        yield "p", "", body
+
+
+# ---------------------------------------------------
+# CLEANING
+# ---------------------------------------------------
+def clean_text(text: str) -> str:
+    """
+    Markers normalized, inline markup dropped, lines stripped and runs of
+    blank lines collapsed to one.
+    """
+    lines = []
+    blank = False
+    for kind, number, body in _lines(text):
+        if not body:
+            blank = bool(lines)
+            continue
+        if blank:
+            lines.append("")
+            blank = False
+        if kind == "p":
+            lines.append(body)
+        elif kind == "ol":
+            lines.append(f"{number}. {body}")
+        else:
+            lines.append(("# " if kind == "h" else "- ") + body)
+    return "\n".join(lines)
+
+
+class StreamCleaner:
+    """
+    Incremental version of `clean_text` for streamed responses.
+
+    Text is passed through as it arrives; only a line's first few
+    characters (until it is clear whether they are a marker), trailing
+    whitespace and newlines are held back, so the concatenated output
+    equals `clean_text(full_text)` once `flush` has been called.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._head = ""          # start of the current line, marker still undecided
+        self._prefix = None      # normalized marker once decided ("" for none)
+        self._started = False    # current line has emitted text
+        self._pending = ""       # trailing whitespace within the line
+        self._newlines = 0       # line breaks since the last emitted text
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def _emit_body(self, body: str) -> str:
+        body = _drop_markup(body)
+        stripped = body.rstrip()
+        if self._started:
+            if not stripped:
+                self._pending += body
+                return ""
+            out = self._pending + stripped
+        else:
+            stripped = stripped.lstrip()
+            if not stripped:
+                return ""
+            out = self._prefix + stripped
+            if self._parts:
+                out = ("\n\n" if self._newlines > 1 else "\n") + out
+            self._started = True
+        self._pending = body[len(body.rstrip()):]
+        self._parts.append(out)
+        return out
+
+    def _decide(self, final: bool) -> str:
+        # Settle the marker of the current line if its start allows it
+        head = self._head
+        if head[:1] in _RAW_MARKER_START:
+            m = _RAW_MARKER.match(head)
+            if m:
+                self._prefix = "# " if m["heading"] else "- "
+                self._head = ""
+                return self._emit_body(head[m.end():])
+            if not final and _PARTIAL_RAW_MARKER.fullmatch(head):
+                return ""
+
+        text = _drop_markup(head).lstrip()
+        m = _LIST_MARKER.match(text) if text[:1] in _LIST_MARKER_START else None
+        if m:
+            self._prefix = "- " if m["bullet"] else m["number"] + ". "
+            text = text[m.end():]
+        elif final or (text and not _PARTIAL_LIST_MARKER.fullmatch(text)):
+            self._prefix = ""
+        else:
+            return ""
+        self._head = ""
+        return self._emit_body(text)
+
+    def _end_line(self) -> str:
+        out = self._decide(final=True) if self._prefix is None else ""
+        self._newlines = 1 if self._started else self._newlines + 1
+        self._prefix, self._started, self._pending = None, False, ""
+        return out
+
+    def _feed_line(self, part: str) -> str:
+        if self._prefix is not None:
+            return self._emit_body(part)
+        self._head += part if self._head else part.lstrip()
+        return self._decide(final=False) if self._head else ""
+
+    def feed(self, chunk: str) -> str:
+        if self._started and "\n" not in chunk:
+            # Mid-line text, the common case: no marker to decide
+            body = _drop_markup(chunk)
+            stripped = body.rstrip()
+            if not stripped:
+                self._pending += body
+                return ""
+            out = self._pending + stripped
+            self._pending = body[len(stripped):]
+            self._parts.append(out)
+            return out
+
+        lines = chunk.split("\n")
+        out = self._feed_line(lines[0])
+        for line in lines[1:]:
+            out += self._end_line()
+            out += self._feed_line(line)
+        return out
+
+    def flush(self) -> str:
+        return self._decide(final=True) if self._prefix is None and self._head else ""
+
+
+# ---------------------------------------------------
+# BLOCKS
+# ---------------------------------------------------
+def parse_blocks(text: str | None) -> list:
+    """Blocks for raw or cleaned text, in one pass over its lines."""
+    blocks = []
+    paragraph = []
+    items = None  # the open list's items
+
+    def close_paragraph():
+        if not paragraph:
+            return
+        blocks.append(["p", " ".join(paragraph)])
+        paragraph.clear()
+
+    for kind, _, body in _lines(text or ""):
+        if not body:
+            close_paragraph()  # lists may have blank lines between items
+            continue
+
+        if kind == "p":
+            items = None
+            paragraph.append(body)
+            continue
+
+        close_paragraph()
+        if kind == "h":
+            blocks.append(["h", body])
+            items = None
+        elif items is not None and blocks[-1][0] == kind:
+            items.append(body)
+        else:
+            items = [body]
+            blocks.append([kind, items])
+
+    close_paragraph()
+    return blocks
+
+
+def section_blocks(section) -> list:
+    """A section's stored blocks, parsed on the fly for rows that predate them."""
+    blocks = getattr(section, "blocks", None)
+    return blocks if blocks is not None else parse_blocks(section.content)
@@ -0,0 +1,161 @@
+# backend/app/cache.py
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+# -------------------------------------------------
+#  IN-PROCESS LRU CACHE WITH TTL
+# -------------------------------------------------
+class TTLCache:
+    """
+    Thread-safe LRU cache. Entries expire after `ttl` seconds and the least
+    recently used ones are evicted once `maxsize` entries (or `max_weight`
+    total weight, if a `weigh` function is given) is exceeded.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        max_weight: Optional[int] = None,
+        weigh: Optional[Callable[[Any], int]] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 1)
+
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, weight, value)
+        self._weight = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, _, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._pop(key)
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value) -> None:
+        weight = self.weigh(value)
+        if self.max_weight is not None and weight > self.max_weight:
+            return  # would evict everything else and still not fit
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+            self._data[key] = (expires_at, weight, value)
+            self._weight += weight
+
+            while len(self._data) > self.maxsize or (
+                self.max_weight is not None and self._weight > self.max_weight
+            ):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key) -> None:
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._weight = 0
+
+    def _pop(self, key) -> None:
+        _, weight, _ = self._data.pop(key)
+        self._weight -= weight
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "weight": self._weight,
+        }
+
+
+# -------------------------------------------------
+#  PERSISTENT SQLITE CACHE (shared across workers)
+# -------------------------------------------------
+class SQLiteCache:
+    """
+    Small key/value store on disk. Every uvicorn worker opens the same file,
+    so an entry written by one worker is visible to the others.
+    """
+
+    PURGE_EVERY = 100  # sets between sweeps of expired rows
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        self.path = path
+        self.ttl = ttl
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._sets = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None or (self.ttl and row[1] + self.ttl <= time.time()):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+
+            self._sets += 1
+            if self.ttl and self._sets % self.PURGE_EVERY == 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl,)
+                )
+
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size}
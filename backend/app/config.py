@@ -8,8 +8,57 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "change_me")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+    ARGON2_TIME_COST: int = int(os.getenv("ARGON2_TIME_COST", "3"))
+    ARGON2_MEMORY_COST: int = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+    ARGON2_PARALLELISM: int = int(os.getenv("ARGON2_PARALLELISM", "4"))
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # "thread" or "process"
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+    AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Async routes use an asyncio driver (see database.py); off keeps the sync driver
+    DB_ASYNC: bool = os.getenv("DB_ASYNC", "false").lower() == "true"
+    ASYNC_DATABASE_URL: str | None = os.getenv("ASYNC_DATABASE_URL")  # default: DATABASE_URL's async form
+    # Per engine (and per process). Recycle below the host's idle-connection
+    # timeout (Railway drops idle MySQL connections) so none are found dead.
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a connection
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "300"))  # seconds; -1 never
+    DB_POOL_WARM: int = int(os.getenv("DB_POOL_WARM", "2"))  # connections opened per pool at startup
+    # Create tables and apply migrations at startup. Off for fast cold starts:
+    # run `python -m app.migrations` as a deploy step instead.
+    AUTO_MIGRATE: bool = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
+    # Optional replica for read-only routes (see database.py)
+    READ_DATABASE_URL: str | None = os.getenv("READ_DATABASE_URL")
+    ASYNC_READ_DATABASE_URL: str | None = os.getenv("ASYNC_READ_DATABASE_URL")  # default: READ_DATABASE_URL's async form
+    READ_AFTER_WRITE_SECONDS: float = float(os.getenv("READ_AFTER_WRITE_SECONDS", "5"))
+    SQL_QUERY_COUNTER: bool = os.getenv("SQL_QUERY_COUNTER", "false").lower() == "true"
+    # /metrics and the timings behind it; off unless the operator opts in
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_TOKEN: str | None = os.getenv("METRICS_TOKEN")  # if set, scrapes must send it as a Bearer token
     LLM_API_KEY: str | None = os.getenv("LLM_API_KEY")
     LLM_API_URL: str | None = os.getenv("LLM_API_URL")
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "5"))
+    LLM_BATCH_GENERATION: bool = os.getenv("LLM_BATCH_GENERATION", "false").lower() == "true"
+    LLM_BATCH_SIZE: int = int(os.getenv("LLM_BATCH_SIZE", "10"))
+    RETRIEVAL_ENABLED: bool = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+    RETRIEVAL_TOKEN_BUDGET: int = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "600"))
+    RETRIEVAL_MAX_PASSAGES: int = int(os.getenv("RETRIEVAL_MAX_PASSAGES", "4"))
+    RETRIEVAL_MIN_SCORE: float = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.05"))
+    RETRIEVAL_INDEX_PROJECTS: int = int(os.getenv("RETRIEVAL_INDEX_PROJECTS", "256"))
+    EXPORT_CACHE_ENTRIES: int = int(os.getenv("EXPORT_CACHE_ENTRIES", "256"))
+    EXPORT_CACHE_MAX_BYTES: int = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    EXPORT_EXECUTOR: str = os.getenv("EXPORT_EXECUTOR", "thread")  # "thread" or "process"
+    EXPORT_WORKERS: int = int(os.getenv("EXPORT_WORKERS", "2"))
+    EXPORT_SPOOL_MAX_BYTES: int = int(os.getenv("EXPORT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+    EXPORT_CHUNK_SIZE: int = int(os.getenv("EXPORT_CHUNK_SIZE", str(64 * 1024)))
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", "2"))
+    JOB_STALE_SECONDS: int = int(os.getenv("JOB_STALE_SECONDS", "30"))
+    HISTORY_SNAPSHOT_EVERY: int = int(os.getenv("HISTORY_SNAPSHOT_EVERY", "10"))
+    PROJECT_PURGE_BATCH_SIZE: int = int(os.getenv("PROJECT_PURGE_BATCH_SIZE", "5000"))
+    IDEMPOTENCY_RETENTION_HOURS: float = float(os.getenv("IDEMPOTENCY_RETENTION_HOURS", "24"))
+    IDEMPOTENCY_LOCK_SECONDS: int = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "300"))
 
 settings = Settings()
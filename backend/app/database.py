@@ -1,15 +1,46 @@
 # backend/app/database.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+from contextlib import AsyncExitStack, ExitStack, contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
+from starlette.concurrency import run_in_threadpool
+from .cache import TTLCache
 from .config import settings
+from . import metrics
+
+
+def _engine_options(url: str) -> dict:
+    """Pool settings from config (the same for the sync and async engines)."""
+    options = {"pool_pre_ping": True}
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options  # a single shared connection, no pool to size
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-)
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return options
+
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# SQLite ignores foreign keys (and so ON DELETE CASCADE) unless asked per connection
+def _enable_sqlite_foreign_keys(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
 Base = declarative_base()
 
 def get_db():
@@ -18,3 +49,298 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ---------------------------------------------------
+# SQL QUERY COUNTER (debug / metrics mode)
+# ---------------------------------------------------
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+
+_query_counter: ContextVar[QueryCounter | None] = ContextVar("query_counter", default=None)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.count += 1
+
+
+@contextmanager
+def count_queries():
+    """Count every statement run on `engine` in this context (incl. threadpool work it spawns)."""
+    counter = QueryCounter()
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
+# ---------------------------------------------------
+# SQL TIMING (/metrics)
+# ---------------------------------------------------
+_STATEMENT_KINDS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE"})
+
+
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None or not settings.METRICS_ENABLED:
+        return
+    kind = statement.lstrip()[:6].upper()
+    metrics.DB_QUERY_SECONDS.labels(kind if kind in _STATEMENT_KINDS else "OTHER").observe(
+        time.perf_counter() - started
+    )
+
+
+def _instrument(target) -> None:
+    """Attach the listeners above to a (sync) Engine."""
+    if target.dialect.name == "sqlite":
+        event.listen(target, "connect", _enable_sqlite_foreign_keys)
+    event.listen(target, "before_cursor_execute", _count_query)
+    event.listen(target, "before_cursor_execute", _start_query_timer)
+    event.listen(target, "after_cursor_execute", _record_query_time)
+
+
+_instrument(engine)
+
+
+# ---------------------------------------------------
+# READ REPLICA
+# ---------------------------------------------------
+# With READ_DATABASE_URL set, read-only routes take their session from
+# `get_read_db` (sync) or `get_async_read_db`. Their SELECTs go to the
+# replica; writes, and everything after a write in the same session, go to
+# the primary. A user who committed a write in the last
+# READ_AFTER_WRITE_SECONDS reads from the primary too, so replication lag
+# never hides their own changes (tracked per process, so with several
+# workers keep the window above the replica lag or use sticky sessions).
+# Without a replica both are plain primary sessions.
+_request_user: ContextVar[int | None] = ContextVar("request_user", default=None)
+_recent_writers = TTLCache(maxsize=100_000, ttl=settings.READ_AFTER_WRITE_SECONDS)
+
+
+def set_request_user(user_id: int) -> None:
+    """Record whose request this is (done by the auth dependency)."""
+    _request_user.set(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _note_write(session):
+    user_id = _request_user.get()
+    if user_id is not None:
+        _recent_writers.set(user_id, True)
+
+
+def _reads_from_primary() -> bool:
+    user_id = _request_user.get()
+    return user_id is not None and _recent_writers.get(user_id) is not None
+
+
+class ReadSession(Session):
+    """Session bound to the replica that sends writes to `info["primary"]`."""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["wrote"] = True
+        if self.info.get("wrote") or _reads_from_primary():
+            return self.info["primary"]
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+if settings.READ_DATABASE_URL:
+    read_engine = create_engine(settings.READ_DATABASE_URL, **_engine_options(settings.READ_DATABASE_URL))
+    _instrument(read_engine)
+    ReadSessionLocal = sessionmaker(
+        class_=ReadSession, autocommit=False, autoflush=False, bind=read_engine, info={"primary": engine}
+    )
+else:
+    read_engine = engine
+    ReadSessionLocal = SessionLocal
+
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def warm_pools(connections: int) -> None:
+    """Open `connections` connections in each sync pool before requests need them."""
+    for pool_engine in {engine, read_engine}:
+        with ExitStack() as stack:
+            for _ in range(connections):
+                stack.enter_context(pool_engine.connect()).exec_driver_sql("SELECT 1")
+
+
+# ---------------------------------------------------
+# ASYNC SESSIONS
+# ---------------------------------------------------
+# Async routes take their session from `get_async_db`. With DB_ASYNC on it
+# is an AsyncSession on an asyncio driver (asyncmy for MySQL, aiosqlite for
+# SQLite), so a request waiting on the database or Gemini holds no thread.
+# With it off (the default) it is the sync Session behind the same awaitable
+# interface, each call run in the threadpool. Either way routes write
+# `await db.execute(select(...))`, `await db.get(...)`, `await db.commit()`,
+# and call the sync helpers (history, retrieval, ...) with
+# `await db.run_sync(helper, *args)`. Relationships must be loaded eagerly:
+# an AsyncSession cannot lazy-load.
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "mysql": "mysql+asyncmy"}
+
+
+def async_database_url(url: str) -> str:
+    """`url` with its driver swapped for the asyncio one."""
+    url = make_url(url)
+    drivername = _ASYNC_DRIVERS.get(url.get_backend_name())
+    if drivername is None:
+        raise ValueError(f"No async driver for {url.get_backend_name()}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+_async_engine = None
+_async_read_engine = None
+_AsyncSessionLocal = None
+_AsyncReadSessionLocal = None
+
+
+def _create_async_engine(url: str):
+    async_engine = create_async_engine(url, **_engine_options(url))
+    _instrument(async_engine.sync_engine)
+    return async_engine
+
+
+def get_async_engine():
+    """The asyncio engines, created on first use (only when DB_ASYNC is on)."""
+    global _async_engine, _async_read_engine, _AsyncSessionLocal, _AsyncReadSessionLocal
+    if _async_engine is None:
+        _async_engine = _create_async_engine(
+            settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+        )
+        # Objects stay readable after commit; expired ones could not lazy-load
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+
+        if settings.READ_DATABASE_URL:
+            _async_read_engine = _create_async_engine(
+                settings.ASYNC_READ_DATABASE_URL or async_database_url(settings.READ_DATABASE_URL)
+            )
+            _AsyncReadSessionLocal = async_sessionmaker(
+                _async_read_engine, sync_session_class=ReadSession,
+                info={"primary": _async_engine.sync_engine},
+                autoflush=False, expire_on_commit=False,
+            )
+        else:
+            _AsyncReadSessionLocal = _AsyncSessionLocal
+    return _async_engine
+
+
+class ThreadedSession:
+    """
+    A sync Session with the awaitable interface of AsyncSession; every call
+    that may touch the database runs in the threadpool. Used for async
+    routes when DB_ASYNC is off.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def execute(self, statement, params=None, *, execution_options=None, **kwargs):
+        # Buffered, like AsyncSession.execute: rows are read in the thread
+        options = {**(execution_options or {}), "prebuffer_rows": True}
+        return await run_in_threadpool(
+            self.sync_session.execute, statement, params, execution_options=options, **kwargs
+        )
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return (await self.execute(statement, params, **kwargs)).scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def refresh(self, instance, attribute_names=None) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def delete(self, instance) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+def async_session(read: bool = False) -> AsyncSession | ThreadedSession:
+    """
+    A new session for async code; close it with `await db.close()`. With
+    `read`, a replica session as described under READ REPLICA.
+    """
+    if settings.DB_ASYNC:
+        get_async_engine()
+        return (_AsyncReadSessionLocal if read else _AsyncSessionLocal)()
+    return ThreadedSession((ReadSessionLocal if read else SessionLocal)(expire_on_commit=False))
+
+
+async def get_async_db():
+    db = async_session()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_async_read_db():
+    db = async_session(read=True)
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def release_async_connection(db: AsyncSession | ThreadedSession) -> None:
+    """
+    End the session's (read-only) transaction so its pooled connection goes
+    back to the pool. Async routes call this before awaiting something slow
+    (Argon2, Gemini); otherwise every in-flight request pins a connection
+    and the pool runs dry. Loaded objects are expired and reload on access.
+    """
+    await db.rollback()
+
+
+async def warm_async_pools(connections: int) -> None:
+    """`warm_pools` for the asyncio engines."""
+    get_async_engine()
+    for pool_engine in {_async_engine, _async_read_engine or _async_engine}:
+        async with AsyncExitStack() as stack:
+            for _ in range(connections):
+                conn = await stack.enter_async_context(pool_engine.connect())
+                await conn.exec_driver_sql("SELECT 1")
+
+
+async def dispose_async_engine() -> None:
+    for async_engine in (_async_engine, _async_read_engine):
+        if async_engine is not None:
+            await async_engine.dispose()
@@ -1,18 +1,34 @@
 # backend/app/docx_export.py
 from io import BytesIO
+from typing import BinaryIO, Optional
 from docx import Document
+from .blocks import section_blocks
 from .models import Project
 
-def build_docx(project: Project) -> BytesIO:
+def build_docx(project: Project, file_stream: Optional[BinaryIO] = None) -> BinaryIO:
+    # `project` may be an ORM Project or an export_pipeline.ExportProject snapshot
     doc = Document()
     doc.add_heading(project.title, level=0)
     doc.add_paragraph(f"Topic: {project.topic}")
 
     for section in sorted(project.sections, key=lambda s: s.order):
         doc.add_heading(section.title, level=1)
-        doc.add_paragraph(section.content or "")
 
-    file_stream = BytesIO()
+        for kind, body in section_blocks(section):
+            if kind == "h":
+                doc.add_heading(body, level=2)
+            elif kind == "ul":
+                for item in body:
+                    doc.add_paragraph(item, style="List Bullet")
+            elif kind == "ol":
+                # Explicit numbers: "List Number" would keep counting across sections
+                for i, item in enumerate(body, start=1):
+                    doc.add_paragraph(f"{i}. {item}", style="List Paragraph")
+            else:
+                doc.add_paragraph(body)
+
+    if file_stream is None:
+        file_stream = BytesIO()
     doc.save(file_stream)
     file_stream.seek(0)
     return file_stream
@@ -0,0 +1,45 @@
+# backend/app/export_cache.py
+import hashlib
+import json
+from typing import Optional
+
+from .cache import TTLCache
+from .config import settings
+from .models import Project
+
+# Bump when the DOCX/PPTX layout changes so old ETags stop matching
+EXPORT_FORMAT_VERSION = 2
+
+export_cache = TTLCache(
+    maxsize=settings.EXPORT_CACHE_ENTRIES,
+    max_weight=settings.EXPORT_CACHE_MAX_BYTES,
+    weigh=len,
+)
+
+
+def project_fingerprint(project: Project) -> str:
+    """Hash of everything that ends up in the exported file."""
+    sections = sorted(project.sections, key=lambda s: s.order)
+    payload = json.dumps(
+        [
+            EXPORT_FORMAT_VERSION,
+            project.doc_type,
+            project.title,
+            project.topic,
+            [[s.order, s.title, s.content or ""] for s in sections],
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
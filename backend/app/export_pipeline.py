@@ -0,0 +1,162 @@
+# backend/app/export_pipeline.py
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import BinaryIO, Iterator, NamedTuple
+
+from .config import settings
+from . import metrics
+
+
+# ---------------------------------------------------
+# PLAIN SNAPSHOTS (safe to hand to another thread/process)
+# ---------------------------------------------------
+class ExportSection(NamedTuple):
+    title: str
+    order: int
+    content: str | None
+    blocks: list | None = None
+
+
+class ExportProject(NamedTuple):
+    title: str
+    topic: str
+    doc_type: str
+    sections: tuple[ExportSection, ...]
+
+
+def snapshot_project(project) -> ExportProject:
+    return ExportProject(
+        title=project.title,
+        topic=project.topic,
+        doc_type=project.doc_type,
+        sections=tuple(
+            ExportSection(title=s.title, order=s.order, content=s.content, blocks=s.blocks)
+            for s in project.sections
+        ),
+    )
+
+
+# python-docx and python-pptx are most of the app's import time, so they
+# are imported by the first export that needs them, not at startup
+def _build_docx(project, file_stream: BinaryIO | None = None) -> BinaryIO:
+    from .docx_export import build_docx
+    return build_docx(project, file_stream)
+
+
+def _build_pptx(project, file_stream: BinaryIO | None = None) -> BinaryIO:
+    from .pptx_export import build_pptx
+    return build_pptx(project, file_stream)
+
+
+BUILDERS = {
+    "docx": _build_docx,
+    "pptx": _build_pptx,
+}
+
+
+# ---------------------------------------------------
+# RENDERING
+# ---------------------------------------------------
+def render_to_spool(doc_type: str, project: ExportProject, spool_max_bytes: int) -> BinaryIO:
+    """
+    Render into a SpooledTemporaryFile: small files stay in memory, anything
+    above `spool_max_bytes` is spilled to disk while it is being written.
+    The returned file is rewound and owned by the caller.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes)
+    try:
+        BUILDERS[doc_type](project, spool)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def _render_in_child(doc_type: str, project: ExportProject, spool_max_bytes: int) -> bytes | str:
+    # Runs in a worker process: small results travel back as bytes, large
+    # ones as the path of a temp file the parent takes ownership of.
+    with render_to_spool(doc_type, project, spool_max_bytes) as spool:
+        size = spool.seek(0, os.SEEK_END)
+        spool.seek(0)
+        if size <= spool_max_bytes:
+            return spool.read()
+
+        with tempfile.NamedTemporaryFile(prefix="export-", delete=False) as out:
+            shutil.copyfileobj(spool, out)
+            return out.name
+
+
+def _adopt_child_result(result: bytes | str, spool_max_bytes: int) -> BinaryIO:
+    file = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes)
+    if isinstance(result, bytes):
+        file.write(result)
+        return file
+
+    try:
+        with open(result, "rb") as src:
+            shutil.copyfileobj(src, file)
+    finally:
+        os.unlink(result)
+    return file
+
+
+_executor: Executor | None = None
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if settings.EXPORT_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.EXPORT_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EXPORT_WORKERS, thread_name_prefix="export"
+            )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def render(doc_type: str, project: ExportProject) -> tuple[BinaryIO, int]:
+    """Render off the event loop in the export pool; returns (file, size)."""
+    loop = asyncio.get_running_loop()
+    spool_max = settings.EXPORT_SPOOL_MAX_BYTES
+    started = time.perf_counter()
+
+    if settings.EXPORT_EXECUTOR == "process":
+        result = await loop.run_in_executor(
+            get_executor(), _render_in_child, doc_type, project, spool_max
+        )
+        # Copying a spilled file back is disk I/O, so keep it off the loop too
+        file = await loop.run_in_executor(None, _adopt_child_result, result, spool_max)
+    else:
+        file = await loop.run_in_executor(
+            get_executor(), render_to_spool, doc_type, project, spool_max
+        )
+
+    size = file.seek(0, os.SEEK_END)
+    file.seek(0)
+
+    metrics.EXPORT_BUILD_SECONDS.labels(doc_type).observe(time.perf_counter() - started)
+    metrics.EXPORT_SIZE_BYTES.labels(doc_type).observe(size)
+    return file, size
+
+
+def iter_file(file: BinaryIO, chunk_size: int | None = None) -> Iterator[bytes]:
+    """Stream a rendered file in chunks and close it when done."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    try:
+        while chunk := file.read(chunk_size):
+            yield chunk
+    finally:
+        file.close()
@@ -0,0 +1,226 @@
+# backend/app/history.py
+#
+# Refinement history is stored as compressed deltas instead of full texts.
+# Revision N of a section holds the edit from revision N-1's content to its
+# own; every HISTORY_SNAPSHOT_EVERY revisions (and whenever a delta would
+# not be smaller) the full text is stored instead, so rebuilding any
+# revision replays at most that many deltas.
+#
+# A row's base is the previous revision's content. `base_content` is only
+# set when that is not true (the content a section had before its first
+# revision, or legacy rows that did not line up).
+#
+# Revision numbers are unique per section. Two saves racing on one section
+# pick the same number and the second commit fails; functions that save
+# revisions are wrapped in `retry_revision_conflicts`, which runs them again
+# on a fresh transaction.
+import difflib
+import functools
+import json
+import re
+import zlib
+from typing import Iterable
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from . import models
+
+# Sentences (with their trailing whitespace). Refinements rewrite whole
+# sentences, and sentences are mostly unique, which keeps the diff fast.
+# Joining the tokens always gives the original text back.
+_TOKEN = re.compile(r"[^.!?\n]+[.!?]*\s*|[.!?\n]+\s*")
+
+# Each retry sees the winner's commit, so this only runs out when more saves
+# than this race on one section at once
+REVISION_CONFLICT_RETRIES = 10
+
+
+# ---------------------------------------------------
+# ENCODING
+# ---------------------------------------------------
+def _tokens(text: str) -> list[str]:
+    return _TOKEN.findall(text)
+
+
+def encode_snapshot(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"))
+
+
+def decode_snapshot(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def encode_delta(old: str, new: str) -> bytes:
+    """
+    Sentence-level edit script from `old` to `new`: `[i, j]` copies old
+    tokens i..j, a string is inserted as is.
+    """
+    old_tokens, new_tokens = _tokens(old), _tokens(new)
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:  # replace / insert; deletes are just not copied
+            ops.append("".join(new_tokens[j1:j2]))
+
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"))
+
+
+def apply_delta(old: str, blob: bytes) -> str:
+    old_tokens = _tokens(old)
+    parts = []
+    for op in json.loads(zlib.decompress(blob)):
+        parts.append(op if isinstance(op, str) else "".join(old_tokens[op[0]:op[1]]))
+    return "".join(parts)
+
+
+def encode_revision(old: str | None, new: str, since_snapshot: int | None) -> tuple[bool, bytes]:
+    """Return (is_snapshot, blob) for a revision `since_snapshot` revisions after the last snapshot."""
+    snapshot = encode_snapshot(new)
+    if since_snapshot is None or since_snapshot >= settings.HISTORY_SNAPSHOT_EVERY:
+        return True, snapshot
+
+    delta = encode_delta(old or "", new)
+    if len(delta) >= len(snapshot):
+        return True, snapshot
+    return False, delta
+
+
+# ---------------------------------------------------
+# WRITING
+# ---------------------------------------------------
+def _latest_revisions(db: Session, section_ids: list[int]) -> dict[int, tuple[int, int]]:
+    # section_id -> (last revision, last snapshot revision), in one query
+    history = models.RefinementHistory
+    rows = db.query(
+        history.section_id,
+        func.max(history.revision),
+        func.max(case((history.is_snapshot, history.revision))),
+    ).filter(history.section_id.in_(section_ids)).group_by(history.section_id)
+    return {section_id: (last or 0, snapshot or 0) for section_id, last, snapshot in rows}
+
+
+def record_revisions(db: Session, changes: Iterable[tuple[models.Section, str, str]]) -> None:
+    """
+    Add a history row for every (section, new_content, prompt) and set the
+    section's content. The caller commits. This is the only place history
+    rows are written.
+    """
+    changes = list(changes)
+    if not changes:
+        return
+
+    section_ids = [section.id for section, _, _ in changes]
+    latest = _latest_revisions(db, section_ids)
+
+    # Re-read the content after the numbers: a revision committed in between
+    # then collides on its number instead of leaving a delta on a stale base
+    db.query(models.Section).filter(models.Section.id.in_(section_ids)).populate_existing().all()
+
+    for section, new_content, prompt in changes:
+        last, last_snapshot = latest.get(section.id, (0, 0))
+        revision = last + 1
+        old = section.content
+
+        is_snapshot, delta = encode_revision(
+            old, new_content, revision - last_snapshot if last_snapshot else None
+        )
+
+        db.add(models.RefinementHistory(
+            section_id=section.id,
+            revision=revision,
+            is_snapshot=is_snapshot,
+            delta=delta,
+            base_content=old if revision == 1 else None,
+            prompt=prompt,
+        ))
+        section.content = new_content
+
+        latest[section.id] = (revision, revision if is_snapshot else last_snapshot)
+
+
+def record_revision(db: Session, section: models.Section, new_content: str, prompt: str) -> None:
+    record_revisions(db, [(section, new_content, prompt)])
+
+
+def retry_revision_conflicts(fn):
+    """
+    Decorate `fn(db, ...)`, which loads sections, records revisions and
+    commits, so that losing a race for a revision number rolls back and
+    runs it again instead of failing after Gemini has already answered.
+    """
+    @functools.wraps(fn)
+    def wrapper(db: Session, *args, **kwargs):
+        for attempt in range(REVISION_CONFLICT_RETRIES + 1):
+            try:
+                return fn(db, *args, **kwargs)
+            except IntegrityError:
+                db.rollback()
+                if attempt == REVISION_CONFLICT_RETRIES:
+                    raise
+    return wrapper
+
+
+# ---------------------------------------------------
+# READING
+# ---------------------------------------------------
+def load_revisions(db: Session, section_id: int, revisions: Iterable[int]) -> dict[int, tuple[str | None, str]]:
+    """
+    (old_content, new_content) for each requested revision. One query reads
+    everything from the closest snapshot before the oldest one requested.
+    """
+    revisions = set(revisions)
+    if not revisions:
+        return {}
+
+    history = models.RefinementHistory
+    low, high = min(revisions), max(revisions)
+
+    # old_content of `low` is the content of `low - 1`, so start before it
+    start = db.query(func.max(history.revision)).filter(
+        history.section_id == section_id,
+        history.is_snapshot.is_(True),
+        history.revision <= max(low - 1, 1),
+    ).scalar_subquery()
+
+    rows = db.query(
+        history.revision, history.is_snapshot, history.delta, history.base_content
+    ).filter(
+        history.section_id == section_id,
+        history.revision >= func.coalesce(start, 1),
+        history.revision <= high,
+    ).order_by(history.revision)
+
+    result = {}
+    previous = None
+    for revision, is_snapshot, delta, base_content in rows:
+        old = base_content if base_content is not None else previous
+        new = decode_snapshot(delta) if is_snapshot else apply_delta(old or "", delta)
+
+        if revision in revisions:
+            result[revision] = (old, new)
+        previous = new
+
+    return result
+
+
+def attach_contents(db: Session, section_id: int, rows: list[models.RefinementHistory]) -> None:
+    """Fill `old_content` / `new_content` on history rows loaded for one section."""
+    contents = load_revisions(db, section_id, (row.revision for row in rows))
+    for row in rows:
+        row.old_content, row.new_content = contents.get(row.revision, (None, None))
+
+
+def diff_revisions(old: str | None, new: str | None, from_label: str, to_label: str) -> str:
+    return "\n".join(difflib.unified_diff(
+        (old or "").splitlines(),
+        (new or "").splitlines(),
+        fromfile=from_label,
+        tofile=to_label,
+        lineterm="",
+    ))
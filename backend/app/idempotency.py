@@ -0,0 +1,148 @@
+# backend/app/idempotency.py
+#
+# Idempotency-Key support for the expensive POSTs (generate, refine). The
+# first request with a key claims it; once it succeeds its response is
+# stored, and repeats of that request within IDEMPOTENCY_RETENTION_HOURS get
+# the stored response back without running it again. A key reused for a
+# different request is rejected, and a failed request gives its key up so
+# the client can retry with it.
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from . import models
+
+MAX_KEY_LENGTH = 255
+PURGE_EVERY_SECONDS = 3600
+
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+def fingerprint(*parts) -> str:
+    """Hash of what makes a request "the same request" (route, ids, payload)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _expired_before() -> datetime:
+    return datetime.utcnow() - timedelta(hours=settings.IDEMPOTENCY_RETENTION_HOURS)
+
+
+# ---------------------------------------------------
+# CLAIM / COMPLETE / ABANDON
+# ---------------------------------------------------
+def begin(db: Session, owner_id: int, key: str | None, request_hash: str) -> models.IdempotencyKey | None:
+    """
+    Claim `key` for this request. Returns None without a key, a row with
+    `status_code` set when a stored response should be replayed (see
+    `replay`), or a new in-progress row to pass to `complete`/`abandon`.
+    """
+    if key is None:
+        return None
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+    _maybe_purge(db)
+
+    row = db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.owner_id == owner_id,
+        models.IdempotencyKey.key == key,
+    ).first()
+
+    if row is not None:
+        expired = row.created_at < _expired_before()
+        stale = (
+            row.status_code is None
+            and row.created_at < datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        )
+        if not expired and not stale:
+            if row.request_hash != request_hash:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used for a different request",
+                )
+            if row.status_code is None:
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": "1"},
+                )
+            return row
+
+        # Expired, or left behind by a process that died mid-request
+        db.delete(row)
+        db.flush()
+
+    row = models.IdempotencyKey(owner_id=owner_id, key=key, request_hash=request_hash)
+    db.add(row)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request claimed the key between our read and insert
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "1"},
+        )
+    return row
+
+
+def replay(row: models.IdempotencyKey) -> JSONResponse:
+    return JSONResponse(
+        status_code=row.status_code,
+        content=json.loads(row.response_body),
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def complete(db: Session, row: models.IdempotencyKey | None, status_code: int, body) -> None:
+    """Store the response for `row` (a no-op without a key) and commit."""
+    if row is None:
+        return
+    db.query(models.IdempotencyKey).filter(models.IdempotencyKey.id == row.id).update({
+        "status_code": status_code,
+        "response_body": json.dumps(jsonable_encoder(body)),
+    }, synchronize_session=False)
+    db.commit()
+
+
+def abandon(db: Session, row: models.IdempotencyKey | None) -> None:
+    """Give the key up after a failure so the request can be retried with it."""
+    if row is None:
+        return
+    db.rollback()
+    db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.id == row.id
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+# ---------------------------------------------------
+# RETENTION
+# ---------------------------------------------------
+def purge_expired(db: Session) -> int:
+    deleted = db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.created_at < _expired_before()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def _maybe_purge(db: Session) -> None:
+    # Expired keys are replaced on reuse anyway; this keeps the table small
+    global _last_purge
+    with _purge_lock:
+        if time.monotonic() - _last_purge < PURGE_EVERY_SECONDS:
+            return
+        _last_purge = time.monotonic()
+    purge_expired(db)
@@ -0,0 +1,297 @@
+# backend/app/jobs.py
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session, selectinload
+
+from .config import settings
+from .database import SessionLocal, async_session, release_async_connection
+from . import models, llm, history, retrieval
+
+
+# ---------------------------------------------------
+# SUBMIT + LOOKUP
+# ---------------------------------------------------
+def get_job(db: Session, job_id: int, owner_id: int) -> models.Job | None:
+    # Items and their sections are read for every JobOut, so load them up front
+    return db.query(models.Job).options(
+        selectinload(models.Job.items).joinedload(models.JobItem.section)
+    ).filter(
+        models.Job.id == job_id,
+        models.Job.owner_id == owner_id
+    ).first()
+
+
+def submit_generation_job(db: Session, project: models.Project, fresh: bool = False) -> models.Job:
+    job = models.Job(project_id=project.id, owner_id=project.owner_id, fresh=fresh)
+    for sec in project.sections:
+        job.items.append(models.JobItem(section_id=sec.id))
+
+    db.add(job)
+    db.commit()
+
+    queue.notify()
+    return get_job(db, job.id, project.owner_id)
+
+
+# ---------------------------------------------------
+# WORKER POOL (backed by the jobs table)
+# ---------------------------------------------------
+class JobQueue:
+    """
+    Runs generation jobs stored in the database on a fixed number of asyncio
+    workers. Jobs are claimed with a conditional UPDATE, so several uvicorn
+    processes can share one table. A running job refreshes `updated_at` as a
+    heartbeat; if a process dies, its jobs go stale and are re-queued, and
+    only the sections that have not finished are generated again.
+    """
+
+    def __init__(self, workers: int, poll_seconds: float, stale_seconds: int):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self._wake: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def notify(self) -> None:
+        # Sync routes submit from the threadpool; asyncio.Event is not
+        # thread-safe, so the wake-up is handed to the workers' loop
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job_id = await self._claim()
+            except Exception as e:
+                print("JOB ERROR:", e)
+                job_id = None
+
+            if job_id is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print("JOB ERROR:", e)
+                await self._set_status(job_id, "failed")
+            finally:
+                heartbeat.cancel()
+
+    # ---------------------------------------------------
+    # DB HELPERS
+    # ---------------------------------------------------
+    # All SQL goes through the async session: a blocking statement on the
+    # event loop, waiting on a lock held by an async connection, would stall
+    # the very loop that has to release it.
+    async def _claim(self) -> int | None:
+        db = async_session()
+        try:
+            return await db.run_sync(self._claim_next)
+        finally:
+            await db.close()
+
+    def _claim_next(self, db: Session) -> int | None:
+        now = datetime.utcnow()
+
+        # Re-queue jobs whose worker stopped sending heartbeats
+        db.query(models.Job).filter(
+            models.Job.status == "running",
+            models.Job.updated_at < now - timedelta(seconds=self.stale_seconds)
+        ).update({"status": "pending"}, synchronize_session=False)
+        db.commit()
+
+        candidates = db.query(models.Job.id).filter(
+            models.Job.status == "pending"
+        ).order_by(models.Job.id).limit(self.workers).all()
+
+        for (job_id,) in candidates:
+            claimed = db.query(models.Job).filter(
+                models.Job.id == job_id,
+                models.Job.status == "pending"
+            ).update({"status": "running", "updated_at": now}, synchronize_session=False)
+            db.commit()
+
+            if claimed:
+                return job_id
+
+        return None
+
+    async def _update_job(self, job_id: int, **values) -> None:
+        db = async_session()
+        try:
+            await db.execute(update(models.Job).where(models.Job.id == job_id).values(**values))
+            await db.commit()
+        finally:
+            await db.close()
+
+    async def _set_status(self, job_id: int, status: str) -> None:
+        now = datetime.utcnow()
+        await self._update_job(job_id, status=status, updated_at=now, finished_at=now)
+
+    async def _heartbeat(self, job_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            await self._update_job(job_id, updated_at=datetime.utcnow())
+
+    # ---------------------------------------------------
+    # JOB EXECUTION
+    # ---------------------------------------------------
+    async def _run(self, job_id: int) -> None:
+        db = async_session()
+        try:
+            loaded = await db.run_sync(_load_job, job_id)
+            if loaded is None:
+                await self._set_status(job_id, "failed")
+                return
+
+            project_id, topic, fresh, owner_id, pending = loaded
+
+            # Sibling context is CPU work, so it is built off the event loop
+            contexts = await retrieval.agenerate_contexts(
+                project_id, [section for _, section in pending], topic
+            )
+            pending = [
+                (item_id, section.title, context)
+                for (item_id, section), context in zip(pending, contexts)
+            ]
+
+            # Release the pooled connection while the LLM calls are in flight
+            await release_async_connection(db)
+
+            semaphore = asyncio.Semaphore(max(1, settings.LLM_MAX_CONCURRENCY))
+            saving = asyncio.Lock()  # the session is shared by the sections
+
+            async def _generate(item_id: int, title: str, context: str | None) -> None:
+                error = None
+                async with semaphore:
+                    try:
+                        new_text = await llm.agenerate_llm_content(
+                            section_title=title, topic=topic, fresh=fresh, context=context, user_id=owner_id
+                        )
+                    except Exception as e:
+                        print("LLM ERROR:", e)
+                        error = str(e) if isinstance(e, llm.LLMError) else llm.FAILURE_MESSAGE
+
+                # Each section is committed as soon as it is done, so progress
+                # is visible to pollers and survives a restart
+                async with saving:
+                    await db.run_sync(_save_item, item_id, new_text if error is None else None, error)
+
+            await asyncio.gather(*(_generate(*args) for args in pending))
+        finally:
+            await db.close()
+
+        await self._set_status(job_id, "done")
+
+
+def _load_job(db: Session, job_id: int) -> tuple | None:
+    """(project_id, topic, fresh, owner_id, [(item_id, section)]) for the unfinished items."""
+    job = db.query(models.Job).options(
+        selectinload(models.Job.items).joinedload(models.JobItem.section)
+    ).filter(models.Job.id == job_id).one()
+    project = db.get(models.Project, job.project_id)
+
+    if project is None or project.deleted_at is not None:
+        return None
+
+    return project.id, project.topic, job.fresh, project.owner_id, [
+        (item.id, item.section) for item in job.items if item.status != "done"
+    ]
+
+
+@history.retry_revision_conflicts
+def _save_item(db: Session, item_id: int, new_text: str | None, error: str | None) -> None:
+    item = db.get(models.JobItem, item_id)
+    if item is None:
+        return  # the project was deleted meanwhile
+
+    if error is not None:
+        item.status = "failed"
+        item.error = error
+    else:
+        history.record_revision(db, item.section, new_text, "Initial generation")
+        item.status = "done"
+        item.error = None
+
+    db.commit()
+
+
+# ---------------------------------------------------
+# PROJECT PURGE (soft-deleted projects)
+# ---------------------------------------------------
+def purge_project(project_id: int, batch_size: int | None = None) -> None:
+    """
+    Remove a soft-deleted project. Refinement history is the bulk of a large
+    project, so it goes first in small committed batches that keep lock
+    times short; the final DELETE cascades to everything that is left.
+    """
+    batch_size = batch_size or settings.PROJECT_PURGE_BATCH_SIZE
+    refinements = models.RefinementHistory
+
+    db = SessionLocal()
+    try:
+        section_ids = db.query(models.Section.id).filter(
+            models.Section.project_id == project_id
+        ).scalar_subquery()
+
+        while True:
+            ids = [row[0] for row in db.query(refinements.id).filter(
+                refinements.section_id.in_(section_ids)
+            ).limit(batch_size)]
+            if not ids:
+                break
+
+            db.query(refinements).filter(refinements.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+
+        db.query(models.Project).filter(
+            models.Project.id == project_id,
+            models.Project.deleted_at.isnot(None)
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def purge_deleted_projects() -> None:
+    db = SessionLocal()
+    try:
+        project_ids = [row[0] for row in db.query(models.Project.id).filter(
+            models.Project.deleted_at.isnot(None)
+        )]
+    finally:
+        db.close()
+
+    for project_id in project_ids:
+        try:
+            purge_project(project_id)
+        except Exception as e:
+            print("PURGE ERROR:", e)
+
+
+queue = JobQueue(
+    workers=settings.JOB_WORKERS,
+    poll_seconds=settings.JOB_POLL_SECONDS,
+    stale_seconds=settings.JOB_STALE_SECONDS,
+)
@@ -1,17 +1,82 @@
+import asyncio
+import hashlib
+import json
+import math
 import os
-import requests
+import re
+import time
+from contextlib import contextmanager
+
+import httpx
 from dotenv import load_dotenv
 
+from . import metrics
+from .blocks import StreamCleaner, clean_text
+from .cache import SQLiteCache, TTLCache
+from .resilience import CircuitBreaker, RateLimiter, backoff_delay, parse_retry_after
+
 load_dotenv()
 
 LLM_API_KEY = os.getenv("LLM_API_KEY")
-MODEL_NAME = "gemini-2.0-flash"
-LLM_API_URL = (
-    f"https://generativelanguage.googleapis.com/v1/models/{MODEL_NAME}:generateContent?key={LLM_API_KEY}"
-)
+MODEL_NAME = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+# Point at a local fake server (benchmarks/fake_gemini.py) for tests and load runs
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://generativelanguage.googleapis.com/v1").rstrip("/")
+LLM_API_URL = f"{LLM_BASE_URL}/models/{MODEL_NAME}:generateContent?key={LLM_API_KEY}"
+LLM_STREAM_URL = f"{LLM_BASE_URL}/models/{MODEL_NAME}:streamGenerateContent?alt=sse&key={LLM_API_KEY}"
 
 HEADERS = { "Content-Type": "application/json" }
 
+# Connection pool + timeouts (seconds) for the shared client
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+# Client-side rate limits (calls per second; 0 turns a limit off). Callers
+# queue for the global bucket up to LLM_RATE_MAX_WAIT seconds, and for their
+# own bucket up to LLM_USER_RATE_MAX_WAIT; beyond that they get an LLMError.
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "10"))
+LLM_RATE_BURST = float(os.getenv("LLM_RATE_BURST", "20"))
+LLM_RATE_MAX_WAIT = float(os.getenv("LLM_RATE_MAX_WAIT", "30"))
+LLM_USER_RATE_PER_SECOND = float(os.getenv("LLM_USER_RATE_PER_SECOND", "1"))
+LLM_USER_RATE_BURST = float(os.getenv("LLM_USER_RATE_BURST", "20"))
+LLM_USER_RATE_MAX_WAIT = float(os.getenv("LLM_USER_RATE_MAX_WAIT", "10"))
+
+# Retries (timeouts, 429 and 5xx) with jittered exponential backoff; a
+# Retry-After longer than LLM_BACKOFF_MAX is passed on to the caller instead
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+# Circuit breaker: fail fast after this many failed attempts in a row
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# Response cache: in-process LRU, plus an optional SQLite file shared by workers
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH")
+
+# Refinement of long sections: content estimated above LLM_REFINE_MAX_SINGLE_TOKENS
+# is split into parts of about LLM_REFINE_CHUNK_TOKENS, refined concurrently
+LLM_REFINE_MAX_SINGLE_TOKENS = int(os.getenv("LLM_REFINE_MAX_SINGLE_TOKENS", "3000"))
+LLM_REFINE_CHUNK_TOKENS = int(os.getenv("LLM_REFINE_CHUNK_TOKENS", "1500"))
+LLM_REFINE_CONCURRENCY = int(os.getenv("LLM_REFINE_CONCURRENCY", "4"))
+
+FAILURE_MESSAGE = "AI generation failed."
+
+
+class LLMError(Exception):
+    """
+    A Gemini call that did not produce text. `status_code` is what the API
+    answers with (429 when the caller is being rate limited, 503 otherwise)
+    and `retry_after` is passed on as a Retry-After header when known.
+    """
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: float | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
 SYSTEM_INSTRUCTIONS = """
 You are an expert academic & professional writing assistant.
 
@@ -30,76 +95,836 @@ Write content that is:
 def clean_output(text: str) -> str:
     if not isinstance(text, str):
         return text
+    return clean_text(text)
+
+
+def build_full_prompt(prompt: str) -> str:
+    return SYSTEM_INSTRUCTIONS + "\n\nUSER REQUEST:\n" + prompt
 
-    # Remove asterisks
-    text = text.replace("*", "")
 
-    # Remove markdown headers
-    text = text.replace("###", "")
-    text = text.replace("##", "")
-    text = text.replace("#", "")
+def estimate_tokens(text: str) -> int:
+    # Rough Gemini-style count (~4 characters per token for English prose);
+    # good enough for budgeting prompt space, not for billing
+    return (len(text) + 3) // 4
 
-    # Remove stray underscores
-    text = text.replace("_", "")
 
-    # Remove extra spaces
-    return text.strip()
+def _with_context(prompt: str, context: str | None) -> str:
+    if not context:
+        return prompt
+    return (
+        f"{prompt}\n\n"
+        f"RELATED CONTENT FROM OTHER SECTIONS OF THIS DOCUMENT "
+        f"(stay consistent with it, do not repeat it):\n{context}"
+    )
 
 
 # -------------------------------------------------
-#  CALL GEMINI FUNCTION
+#  RESPONSE CACHE (content-addressed)
 # -------------------------------------------------
-def call_llm(prompt: str) -> str:
-    full_user_prompt = SYSTEM_INSTRUCTIONS + "\n\nUSER REQUEST:\n" + prompt
+class LLMCache:
+    """
+    Cleaned responses keyed by a hash of the model name and the final
+    prompt. Lookups hit the in-process LRU first, then the optional
+    on-disk tier; disk hits are promoted into memory.
+    """
 
-    payload = {
-        "contents": [
-            {
-                "role": "user",
-                "parts": [{"text": full_user_prompt}]
-            }
-        ]
-    }
+    def __init__(self, maxsize: int, ttl: float, db_path: str | None = None):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk = SQLiteCache(db_path, ttl=ttl) if db_path else None
 
-    try:
-        res = requests.post(LLM_API_URL, json=payload, headers=HEADERS)
+    @staticmethod
+    def key(prompt: str) -> str:
+        raw = f"{MODEL_NAME}\0{build_full_prompt(prompt)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-        print("STATUS:", res.status_code)
-        print("RAW:", res.text)
+    def get(self, prompt: str) -> str | None:
+        key = self.key(prompt)
+
+        text = self.memory.get(key)
+        if text is None and self.disk is not None:
+            text = self.disk.get(key)
+            if text is not None:
+                self.memory.set(key, text)
+        return text
 
+    def set(self, prompt: str, text: str) -> None:
+        key = self.key(prompt)
+        self.memory.set(key, text)
+        if self.disk is not None:
+            self.disk.set(key, text)
+
+    def stats(self) -> dict:
+        stats = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+
+response_cache = LLMCache(
+    maxsize=LLM_CACHE_SIZE,
+    ttl=LLM_CACHE_TTL_SECONDS,
+    db_path=LLM_CACHE_DB_PATH,
+)
+
+
+# -------------------------------------------------
+#  POOLED GEMINI CLIENT (sync + async)
+# -------------------------------------------------
+class LLMClient:
+    """
+    Reusable Gemini client. Both the sync and the async httpx clients keep
+    their connections alive between calls, so we only pay the TLS
+    handshake once per pooled connection instead of once per request.
+    """
+
+    def __init__(
+        self,
+        api_url: str = LLM_API_URL,
+        stream_url: str = LLM_STREAM_URL,
+        connect_timeout: float = LLM_CONNECT_TIMEOUT,
+        read_timeout: float = LLM_READ_TIMEOUT,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+    ):
+        self.api_url = api_url
+        self.stream_url = stream_url
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self._client: httpx.Client | None = None
+        self._async_client: httpx.AsyncClient | None = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(
+                headers=HEADERS, timeout=self.timeout, limits=self.limits
+            )
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # An AsyncClient's connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                headers=HEADERS, timeout=self.timeout, limits=self.limits
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    @staticmethod
+    def build_payload(prompt: str, json_output: bool = False) -> dict:
+        full_user_prompt = build_full_prompt(prompt)
+
+        payload = {
+            "contents": [
+                {
+                    "role": "user",
+                    "parts": [{"text": full_user_prompt}]
+                }
+            ]
+        }
+
+        if json_output:
+            payload["generationConfig"] = {"responseMimeType": "application/json"}
+
+        return payload
+
+    @staticmethod
+    def parse_response(res: httpx.Response) -> tuple[str, dict | None]:
+        """(text, usageMetadata or None) from a generateContent response."""
         res.raise_for_status()
 
         data = res.json()
+        return data["candidates"][0]["content"]["parts"][0]["text"], data.get("usageMetadata")
+
+    # ---------------------------------------------------
+    # RATE LIMITS, RETRIES, CIRCUIT BREAKER
+    # ---------------------------------------------------
+    @staticmethod
+    def _admit(user_id, operation: str) -> float:
+        """Seconds to wait before the next attempt may go out; raises if it may not go out."""
+        retry_after = breaker.before_call()
+        if retry_after:
+            _count_error(operation, "circuit_open")
+            raise LLMError("AI service is temporarily unavailable", 503, retry_after)
+
+        scope, wait = limiter.reserve(user_id, LLM_RATE_MAX_WAIT, LLM_USER_RATE_MAX_WAIT)
+        if scope is not None:
+            _count_error(operation, f"{scope}_rate_limit")
+        if scope == "user":
+            raise LLMError("Too many AI requests, please slow down", 429, wait)
+        if scope == "global":
+            raise LLMError("AI service is busy, please retry shortly", 503, wait)
+        return wait
+
+    def _text(self, res: httpx.Response, prompt: str, operation: str) -> str:
+        breaker.record_success()
+        try:
+            text, usage = self.parse_response(res)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            _count_error(operation, "no_text")
+            raise LLMError("AI service returned no text", 503) from e
+        _count_tokens(operation, prompt, text, usage)
+        return text
+
+    @staticmethod
+    def _failure(res: httpx.Response | None, attempt: int, operation: str) -> tuple[LLMError, float | None]:
+        """
+        The error for a failed attempt (`res` is None when the request did
+        not get a response) and the delay before retrying, None if not.
+        """
+        _count_error(operation, "no_response" if res is None else str(res.status_code))
+        if res is None:
+            breaker.record_failure()
+            error, retryable = LLMError("AI service did not respond", 503), True
+        elif res.status_code == 429:
+            retry_after = parse_retry_after(res.headers.get("Retry-After"))
+            error, retryable = LLMError("AI service is rate limiting requests", 429, retry_after), True
+        elif res.status_code >= 500:
+            breaker.record_failure()
+            retry_after = parse_retry_after(res.headers.get("Retry-After"))
+            error, retryable = LLMError(f"AI service error ({res.status_code})", 503, retry_after), True
+        else:
+            breaker.record_success()  # it answered; the request itself was bad
+            error, retryable = LLMError(f"AI request was rejected ({res.status_code})", 503), False
+
+        if not retryable or attempt >= LLM_MAX_RETRIES:
+            return error, None
+
+        delay = backoff_delay(attempt, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX)
+        if error.retry_after is not None:
+            if error.retry_after > LLM_BACKOFF_MAX:
+                return error, None
+            delay = max(delay, error.retry_after)
+
+        print("LLM RETRY:", error, f"(in {delay:.1f}s)")
+        return error, delay
+
+    # ---------------------------------------------------
+    # CALLS
+    # ---------------------------------------------------
+    def generate(self, prompt: str, json_output: bool = False, user_id=None, operation: str = "generate") -> str:
+        payload = self.build_payload(prompt, json_output)
+        attempt = 0
+        with _timed_call(operation):
+            while True:
+                time.sleep(self._admit(user_id, operation))
+                try:
+                    res = self.client.post(self.api_url, json=payload)
+                except httpx.TransportError as e:
+                    print("LLM ERROR:", e)
+                    res = None
+                else:
+                    if res.status_code < 400:
+                        return self._text(res, prompt, operation)
+
+                error, delay = self._failure(res, attempt, operation)
+                if delay is None:
+                    raise error
+                time.sleep(delay)
+                attempt += 1
+
+    async def agenerate(
+        self, prompt: str, json_output: bool = False, user_id=None, operation: str = "generate"
+    ) -> str:
+        payload = self.build_payload(prompt, json_output)
+        attempt = 0
+        with _timed_call(operation):
+            while True:
+                await asyncio.sleep(self._admit(user_id, operation))
+                try:
+                    res = await self.async_client.post(self.api_url, json=payload)
+                except httpx.TransportError as e:
+                    print("LLM ERROR:", e)
+                    res = None
+                else:
+                    if res.status_code < 400:
+                        return self._text(res, prompt, operation)
+
+                error, delay = self._failure(res, attempt, operation)
+                if delay is None:
+                    raise error
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def astream(self, prompt: str, user_id=None, operation: str = "generate"):
+        """
+        Yield raw text chunks from `streamGenerateContent` (SSE framing).
+        Opening the stream is retried like `agenerate`; once text has been
+        sent, a broken stream raises LLMError.
+        """
+        payload = self.build_payload(prompt)
+        attempt = 0
+        with _timed_call(operation):
+            while True:
+                await asyncio.sleep(self._admit(user_id, operation))
+                started = False
+                try:
+                    async with self.async_client.stream("POST", self.stream_url, json=payload) as res:
+                        if res.status_code < 400:
+                            breaker.record_success()
+                            started = True
+                            parts, usage = [], None
+                            async for line in res.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+
+                                data = json.loads(line[len("data:"):])
+                                usage = data.get("usageMetadata", usage)  # running totals
+                                for candidate in data.get("candidates", [])[:1]:
+                                    for part in candidate.get("content", {}).get("parts", []):
+                                        if part.get("text"):
+                                            parts.append(part["text"])
+                                            yield part["text"]
+                            _count_tokens(operation, prompt, "".join(parts), usage)
+                            return
+                except httpx.TransportError as e:
+                    print("LLM ERROR:", e)
+                    if started:
+                        breaker.record_failure()
+                        _count_error(operation, "stream_interrupted")
+                        raise LLMError("AI response stream was interrupted", 503) from e
+                    res = None
+
+                error, delay = self._failure(res, attempt, operation)
+                if delay is None:
+                    raise error
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def awarm(self) -> None:
+        """
+        Open a pooled connection to the API host (DNS, TCP and TLS) before
+        the first real call needs one. The HEAD request costs no quota and
+        its status does not matter.
+        """
+        try:
+            await self.async_client.head(httpx.URL(self.api_url).join("/"))
+        except httpx.HTTPError as e:
+            print("LLM WARM-UP FAILED:", e)
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_loop = None
+
+
+# ---------------------------------------------------
+# METRICS
+# ---------------------------------------------------
+@contextmanager
+def _timed_call(operation: str):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except (GeneratorExit, asyncio.CancelledError):
+        outcome = "cancelled"  # the caller went away mid-call
+        raise
+    finally:
+        metrics.LLM_CALL_SECONDS.labels(operation, outcome).observe(time.perf_counter() - started)
+
+
+def _count_error(operation: str, reason: str) -> None:
+    metrics.LLM_ERRORS.labels(operation, reason).inc()
+
+
+def _count_tokens(operation: str, prompt: str, text: str, usage: dict | None) -> None:
+    # Gemini reports usage; fall back to the same estimate used for budgeting
+    usage = usage or {}
+    prompt_tokens = usage.get("promptTokenCount") or estimate_tokens(build_full_prompt(prompt))
+    completion_tokens = usage.get("candidatesTokenCount") or estimate_tokens(text)
+    metrics.LLM_TOKENS.labels(operation, "prompt").inc(prompt_tokens)
+    metrics.LLM_TOKENS.labels(operation, "completion").inc(completion_tokens)
+
+
+limiter = RateLimiter(
+    LLM_RATE_PER_SECOND, LLM_RATE_BURST, LLM_USER_RATE_PER_SECOND, LLM_USER_RATE_BURST
+)
+breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+client = LLMClient()
+
+
+# -------------------------------------------------
+#  CALL GEMINI FUNCTION
+# -------------------------------------------------
+# `fresh=True` skips the cache lookup (the new answer is still stored).
+# `user_id` selects the caller's rate-limit bucket (None: global limit only).
+# `operation` ("generate" or "refine") labels the call in /metrics.
+# Failures raise LLMError; nothing is returned or cached in their place.
+
+def call_llm(prompt: str, fresh: bool = False, user_id=None, operation: str = "generate") -> str:
+    if not fresh:
+        cached = response_cache.get(prompt)
+        if cached is not None:
+            return cached
+
+    # Clean the text before returning
+    text = clean_output(client.generate(prompt, user_id=user_id, operation=operation))
+
+    response_cache.set(prompt, text)
+    return text
+
+
+async def acall_llm(prompt: str, fresh: bool = False, user_id=None, operation: str = "generate") -> str:
+    if not fresh:
+        cached = response_cache.get(prompt)
+        if cached is not None:
+            return cached
+
+    text = clean_output(await client.agenerate(prompt, user_id=user_id, operation=operation))
+
+    response_cache.set(prompt, text)
+    return text
+
 
-        raw_text = data["candidates"][0]["content"]["parts"][0]["text"]
+async def astream_llm(prompt: str, fresh: bool = False, user_id=None, operation: str = "generate"):
+    """
+    Stream cleaned text deltas for `prompt`. Errors are raised, so a
+    half-finished stream is never mistaken for a result.
+    A cached answer is sent as a single delta.
+    """
+    if not fresh:
+        cached = response_cache.get(prompt)
+        if cached is not None:
+            yield cached
+            return
 
-        # Clean the text before returning
-        return clean_output(raw_text)
+    cleaner = StreamCleaner()
+    async for chunk in client.astream(prompt, user_id=user_id, operation=operation):
+        delta = cleaner.feed(chunk)
+        if delta:
+            yield delta
 
-    except Exception as e:
-        print("LLM ERROR:", e)
-        return "AI generation failed."
+    tail = cleaner.flush()
+    if tail:
+        yield tail
+
+    response_cache.set(prompt, cleaner.text)
 
 
 # -------------------------------------------------
 #  GENERATE SECTION CONTENT
 # -------------------------------------------------
-def generate_llm_content(section_title: str, topic: str) -> str:
-    prompt = (
+def _generate_prompt(section_title: str, topic: str, context: str | None = None) -> str:
+    return _with_context(
         f"Write a detailed, structured section titled '{section_title}' "
         f"based on this topic: {topic}. "
-        f"Make it clear, formal, and highly readable."
+        f"Make it clear, formal, and highly readable.",
+        context,
     )
-    return call_llm(prompt)
+
+
+async def agenerate_llm_content(
+    section_title: str, topic: str, fresh: bool = False, context: str | None = None, user_id=None
+) -> str:
+    return await acall_llm(_generate_prompt(section_title, topic, context), fresh=fresh, user_id=user_id)
+
+
+# -------------------------------------------------
+#  GENERATE MANY SECTIONS CONCURRENTLY
+# -------------------------------------------------
+def _partial_results(results: list, section_count: int) -> list[str | None]:
+    # Failed sections become None so the caller can skip them; if none
+    # succeeded there is nothing to save and the first error is raised
+    errors = [r for r in results if isinstance(r, Exception)]
+    if section_count and len(errors) == section_count:
+        raise next((e for e in errors if isinstance(e, LLMError)), errors[0])
+    return [None if isinstance(r, Exception) else r for r in results]
+
+
+async def agenerate_many(
+    section_titles: list[str],
+    topic: str,
+    max_concurrency: int = 5,
+    fresh: bool = False,
+    contexts: list[str | None] | None = None,
+    user_id=None,
+) -> list[str | None]:
+    """
+    Generate every section concurrently, with at most `max_concurrency`
+    Gemini calls in flight. Results keep the input order; a section
+    whose call failed comes back as None so the caller can skip it,
+    and if every call failed the error is raised instead.
+    `contexts` optionally gives each section related sibling content.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    contexts = contexts or [None] * len(section_titles)
+
+    async def _generate(section_title: str, context: str | None) -> str | Exception:
+        async with semaphore:
+            try:
+                return await agenerate_llm_content(
+                    section_title=section_title, topic=topic, fresh=fresh, context=context, user_id=user_id
+                )
+            except Exception as e:
+                print("LLM ERROR:", e)
+                return e
+
+    results = await asyncio.gather(*(
+        _generate(t, c) for t, c in zip(section_titles, contexts)
+    ))
+    return _partial_results(list(results), len(section_titles))
+
+
+# -------------------------------------------------
+#  BATCHED GENERATION (one prompt, JSON output)
+# -------------------------------------------------
+def _batch_prompt(section_titles: list[str], topic: str, context: str | None = None) -> str:
+    outline = "\n".join(f"{i}. {title}" for i, title in enumerate(section_titles, 1))
+    return _with_context(
+        f"Write every section of a document about this topic: {topic}.\n\n"
+        f"OUTLINE:\n{outline}\n\n"
+        f"Each section must be detailed, structured, clear, formal and highly readable. "
+        f"Treat the outline as one document: do not repeat material that belongs "
+        f"to another section.\n\n"
+        f"Return ONLY a JSON object whose keys are the section numbers as strings "
+        f"(\"1\", \"2\", ...) and whose values are the section texts.",
+        context,
+    )
+
+
+def parse_batch_output(raw: str, count: int) -> list[str | None]:
+    """
+    Split a batched JSON answer back into per-section texts (in outline
+    order). Sections missing from the answer come back as None; a reply
+    that is not a JSON object raises ValueError.
+    """
+    raw = raw.strip()
+    if raw.startswith("```"):
+        raw = raw.strip("`")
+        raw = raw[raw.find("{"):]
+
+    data = json.loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("Batched output is not a JSON object")
+
+    results = []
+    for i in range(1, count + 1):
+        text = data.get(str(i))
+        results.append(clean_output(text) if isinstance(text, str) and text.strip() else None)
+    return results
+
+
+async def agenerate_batch(
+    section_titles: list[str],
+    topic: str,
+    max_concurrency: int = 5,
+    batch_size: int = 10,
+    fresh: bool = False,
+    contexts: list[str | None] | None = None,
+    user_id=None,
+) -> list[str | None]:
+    """
+    Generate sections `batch_size` at a time with one JSON-mode prompt per
+    batch. Any section the batched answer does not cover (bad JSON, missing
+    key, failed call) falls back to its own `agenerate_many` call. A batch
+    prompt carries the (de-duplicated) contexts of all of its sections.
+    """
+    batch_size = max(1, batch_size)
+    contexts = contexts or [None] * len(section_titles)
+    batches = [
+        list(range(start, min(start + batch_size, len(section_titles))))
+        for start in range(0, len(section_titles), batch_size)
+    ]
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _generate(indexes: list[int]) -> list[str | None]:
+        context = "\n\n".join(dict.fromkeys(contexts[i] for i in indexes if contexts[i]))
+        prompt = _batch_prompt([section_titles[i] for i in indexes], topic, context)
+
+        raw = None if fresh else response_cache.get(prompt)
+        from_cache = raw is not None
+        try:
+            if raw is None:
+                async with semaphore:
+                    raw = await client.agenerate(prompt, json_output=True, user_id=user_id)
+            results = parse_batch_output(raw, len(indexes))
+        except Exception as e:
+            print("LLM BATCH ERROR:", e)
+            return [None] * len(indexes)
+
+        if not from_cache and all(results):
+            response_cache.set(prompt, raw)
+        return results
+
+    results: list[str | None] = [None] * len(section_titles)
+    for indexes, texts in zip(batches, await asyncio.gather(*(_generate(b) for b in batches))):
+        for i, text in zip(indexes, texts):
+            results[i] = text
+
+    missing = [i for i, text in enumerate(results) if text is None]
+    if missing:
+        try:
+            retried = await agenerate_many(
+                [section_titles[i] for i in missing],
+                topic=topic,
+                max_concurrency=max_concurrency,
+                fresh=fresh,
+                contexts=[contexts[i] for i in missing],
+                user_id=user_id,
+            )
+        except Exception:
+            if len(missing) == len(section_titles):
+                raise
+            retried = [None] * len(missing)
+        for i, text in zip(missing, retried):
+            results[i] = text
+
+    return results
+
+
+async def astream_generate_many(
+    section_titles: list[str],
+    topic: str,
+    max_concurrency: int = 5,
+    fresh: bool = False,
+    contexts: list[str | None] | None = None,
+    user_id=None,
+):
+    """
+    Stream several sections at once, bounded like `agenerate_many`.
+
+    Yields `(index, event, payload)` tuples merged from all streams:
+    ("delta", text) as tokens arrive, then ("done", full_text) or
+    ("error", LLMError) once per section.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    queue: asyncio.Queue = asyncio.Queue()
+    contexts = contexts or [None] * len(section_titles)
+
+    async def _stream(index: int, section_title: str) -> None:
+        prompt = _generate_prompt(section_title, topic, contexts[index])
+        async with semaphore:
+            parts = []
+            try:
+                async for delta in astream_llm(prompt, fresh=fresh, user_id=user_id):
+                    parts.append(delta)
+                    await queue.put((index, "delta", delta))
+            except Exception as e:
+                print("LLM ERROR:", e)
+                error = e if isinstance(e, LLMError) else LLMError(FAILURE_MESSAGE)
+                await queue.put((index, "error", error))
+                return
+        await queue.put((index, "done", "".join(parts)))
+
+    tasks = [asyncio.create_task(_stream(i, t)) for i, t in enumerate(section_titles)]
+    try:
+        for _ in range(len(tasks)):
+            while True:
+                item = await queue.get()
+                yield item
+                if item[1] != "delta":
+                    break
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
 # -------------------------------------------------
 #  REFINE SECTION CONTENT (FIXED BUG)
 # -------------------------------------------------
-def refine_llm_content(current_content: str, prompt: str) -> str:
-    full_prompt = (
+def _refine_prompt(current_content: str, prompt: str, context: str | None = None) -> str:
+    return _with_context(
         f"Improve the following content.\n\n"
         f"INSTRUCTION: {prompt}\n\n"
-        f"CONTENT:\n{current_content}"
+        f"CONTENT:\n{current_content}",
+        context,
     )
-    return call_llm(full_prompt)
+
+
+async def arefine_llm_content(
+    current_content: str, prompt: str, fresh: bool = False, context: str | None = None, user_id=None
+) -> str:
+    chunks = split_into_chunks(current_content)
+    if len(chunks) == 1:
+        return await acall_llm(_refine_prompt(current_content, prompt, context), fresh=fresh, user_id=user_id, operation="refine")
+
+    parts = await asyncio.gather(*_arefine_chunks(chunks, prompt, fresh, context, user_id))
+    return stitch_chunks(chunks, parts)
+
+
+def astream_refine(
+    current_content: str, prompt: str, fresh: bool = False, context: str | None = None, user_id=None
+):
+    chunks = split_into_chunks(current_content)
+    if len(chunks) == 1:
+        return astream_llm(_refine_prompt(current_content, prompt, context), fresh=fresh, user_id=user_id, operation="refine")
+    return _astream_refine_chunks(chunks, prompt, fresh, context, user_id)
+
+
+# -------------------------------------------------
+#  CHUNKED (MAP-REDUCE) REFINEMENT OF LONG SECTIONS
+# -------------------------------------------------
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_long_paragraph(paragraph: str, max_tokens: int) -> list[str]:
+    # Sentence boundaries first; a single sentence over budget is cut by length
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(paragraph):
+        while estimate_tokens(sentence) > max_tokens:
+            cut = sentence.rfind(" ", 0, max_tokens * 4)
+            cut = cut if cut > 0 else max_tokens * 4
+            pieces.extend(p for p in (current, sentence[:cut]) if p)
+            current, sentence = "", sentence[cut:].lstrip()
+        if current and estimate_tokens(current + " " + sentence) > max_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(
+    content: str, max_single_tokens: int | None = None, chunk_tokens: int | None = None
+) -> list[str]:
+    """
+    Split `content` into parts to refine separately, on paragraph
+    boundaries. Content within `max_single_tokens` comes back whole. Parts
+    are sized evenly (never above `chunk_tokens`), so the last one is not
+    a short leftover.
+    """
+    max_single_tokens = LLM_REFINE_MAX_SINGLE_TOKENS if max_single_tokens is None else max_single_tokens
+    chunk_tokens = LLM_REFINE_CHUNK_TOKENS if chunk_tokens is None else chunk_tokens
+
+    total = estimate_tokens(content)
+    if total <= max_single_tokens:
+        return [content]
+
+    target = math.ceil(total / math.ceil(total / chunk_tokens))
+
+    paragraphs = []
+    for paragraph in _PARAGRAPH_BREAK.split(content.strip()):
+        paragraph = paragraph.strip()
+        if estimate_tokens(paragraph) > chunk_tokens:
+            paragraphs.extend(_split_long_paragraph(paragraph, chunk_tokens))
+        elif paragraph:
+            paragraphs.append(paragraph)
+
+    chunks, current, size = [], [], 0
+    for paragraph in paragraphs:
+        cost = estimate_tokens(paragraph)
+        if current and (size + cost > chunk_tokens or size >= target):
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += cost
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _refine_chunk_prompt(
+    chunk: str, prompt: str, part: int, parts: int, preceding: str | None, context: str | None
+) -> str:
+    text = (
+        f"Improve the following content. It is part {part} of {parts} of one longer "
+        f"section; the other parts are improved separately and joined with this one. "
+        f"Improve only this part: do not add a title, introduction or conclusion "
+        f"of your own, and keep any headings it has.\n\n"
+        f"INSTRUCTION: {prompt}\n\n"
+    )
+    if preceding:
+        text += f"TEXT JUST BEFORE THIS PART (for continuity only, do not repeat it):\n{preceding}\n\n"
+    return _with_context(text + f"CONTENT:\n{chunk}", context)
+
+
+def _last_paragraph(text: str) -> str:
+    return _PARAGRAPH_BREAK.split(text.strip())[-1]
+
+
+def _refine_chunk_prompts(chunks: list[str], prompt: str, context: str | None) -> list[str]:
+    return [
+        _refine_chunk_prompt(
+            chunk, prompt, i + 1, len(chunks), _last_paragraph(chunks[i - 1]) if i else None, context
+        )
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def _arefine_chunks(chunks: list[str], prompt: str, fresh: bool, context: str | None, user_id=None) -> list:
+    """One coroutine per chunk, at most LLM_REFINE_CONCURRENCY of them calling Gemini at once."""
+    semaphore = asyncio.Semaphore(max(1, LLM_REFINE_CONCURRENCY))
+
+    async def _refine(chunk_prompt: str) -> str:
+        async with semaphore:
+            return await acall_llm(chunk_prompt, fresh=fresh, user_id=user_id, operation="refine")
+
+    return [_refine(p) for p in _refine_chunk_prompts(chunks, prompt, context)]
+
+
+def _normalize(paragraph: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", "", paragraph.lower()).split())
+
+
+class ChunkStitcher:
+    """
+    Joins refined parts in order with a light, deterministic consistency
+    pass: blank lines between paragraphs are normalized, and paragraphs a
+    part repeats at its start (the previous part's ending, or the original
+    text it was shown for continuity) are dropped.
+
+    `add` returns the text to append, so the stream can use it as parts
+    finish.
+    """
+
+    def __init__(self, chunks: list[str]):
+        self._chunks = chunks
+        self._seen: set[str] = set()  # normalized ending of the text so far
+        self._written = False
+        self.parts = 0
+
+    def add(self, refined: str) -> str:
+        paragraphs = [p.strip() for p in _PARAGRAPH_BREAK.split(refined.strip()) if p.strip()]
+
+        while paragraphs and _normalize(paragraphs[0]) in self._seen:
+            paragraphs.pop(0)
+
+        out = ""
+        if paragraphs:
+            out = ("\n\n" if self._written else "") + "\n\n".join(paragraphs)
+            self._written = True
+            self._seen = {_normalize(paragraphs[-1])}
+        if self.parts < len(self._chunks):
+            self._seen.add(_normalize(_last_paragraph(self._chunks[self.parts])))
+        self.parts += 1
+        return out
+
+
+def stitch_chunks(chunks: list[str], parts: list[str]) -> str:
+    """Join refined `parts` of the original `chunks` (a failed part has already raised)."""
+    stitcher = ChunkStitcher(chunks)
+    return "".join(stitcher.add(part) for part in parts)
+
+
+async def _astream_refine_chunks(
+    chunks: list[str], prompt: str, fresh: bool, context: str | None, user_id=None
+):
+    # Parts are refined concurrently and sent in order, one delta per part.
+    # Errors raise, like `astream_llm`.
+    tasks = [asyncio.ensure_future(c) for c in _arefine_chunks(chunks, prompt, fresh, context, user_id)]
+    stitcher = ChunkStitcher(chunks)
+    try:
+        for task in tasks:
+            part = await task
+            delta = stitcher.add(part)
+            if delta:
+                yield delta
+    finally:
+        for task in tasks:
+            task.cancel()
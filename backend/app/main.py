@@ -1,21 +1,77 @@
 # backend/app/main.py
 
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+import json
+import secrets
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, BackgroundTasks, Depends, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from datetime import timedelta
-
-from .database import Base, engine, get_db
-from . import models, schemas, auth, llm, docx_export, pptx_export
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, selectinload
+from datetime import datetime, timedelta
+
+from .database import (
+    SessionLocal, async_session, count_queries, dispose_async_engine,
+    get_async_db, get_async_read_db, get_db, get_read_db,
+    release_async_connection, warm_async_pools, warm_pools,
+)
+from . import models, schemas, auth, llm, jobs, history, idempotency, metrics, retrieval, search, export_cache, export_pipeline, migrations
+from .singleflight import flights
+from .pagination import decode_offset_cursor, encode_offset_cursor, keyset_page
 from .config import settings
 
 
 # =========================================================
 # 1️⃣  SINGLE FASTAPI INSTANCE — DO NOT REPEAT
 # =========================================================
-app = FastAPI(title="AI-Assisted Document Authoring Platform")
+def _purge_idempotency_keys() -> None:
+    db = SessionLocal()
+    try:
+        idempotency.purge_expired(db)
+    finally:
+        db.close()
+
+
+async def _prepare_database() -> None:
+    loop = asyncio.get_running_loop()
+    if settings.AUTO_MIGRATE:
+        await loop.run_in_executor(None, migrations.migrate)
+
+    warmers = [loop.run_in_executor(None, warm_pools, settings.DB_POOL_WARM)]
+    if settings.DB_ASYNC:
+        warmers.append(warm_async_pools(settings.DB_POOL_WARM))
+    for result in await asyncio.gather(*warmers, return_exceptions=True):
+        if isinstance(result, Exception):
+            print("DB WARM-UP FAILED:", result)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The Gemini connection is opened alongside the DB pools, so the first
+    # requests after a cold start do not pay for connecting. Serving waits
+    # for the schema and pools only; an unreachable API host cannot hold
+    # up startup.
+    llm_warm_up = asyncio.create_task(llm.client.awarm())
+    await _prepare_database()
+    await jobs.queue.start()
+    # Finish purges a previous process was killed in the middle of
+    asyncio.get_running_loop().run_in_executor(None, jobs.purge_deleted_projects)
+    asyncio.get_running_loop().run_in_executor(None, _purge_idempotency_keys)
+    yield
+    llm_warm_up.cancel()
+    await jobs.queue.stop()
+    export_pipeline.shutdown_executor()
+    auth.shutdown_hash_executor()
+    # Release pooled LLM connections on shutdown
+    llm.client.close()
+    await llm.client.aclose()
+    await dispose_async_engine()
+
+
+app = FastAPI(title="AI-Assisted Document Authoring Platform", lifespan=lifespan)
 
 
 # =========================================================
@@ -53,9 +109,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],          # Allow all methods (GET, POST, PUT, DELETE, OPTIONS)
     allow_headers=["*"],          # Allow all headers (including Authorization)
+    expose_headers=["X-Next-Cursor"],  # Cursor for the next page of GET /projects
 )
 
 
+# Per-route latency and in-flight gauges for /metrics (see metrics.py)
+app.add_middleware(metrics.MetricsMiddleware, routes=app.router.routes)
+
+
+# Debug/metrics mode: report how many SQL statements each request ran
+if settings.SQL_QUERY_COUNTER:
+    @app.middleware("http")
+    async def count_sql_queries(request, call_next):
+        with count_queries() as counter:
+            response = await call_next(request)
+        response.headers["X-SQL-Queries"] = str(counter.count)
+        return response
+
+
+# LLM failures become 503 (provider down, circuit open) or 429 (the user is
+# over their rate limit) instead of placeholder text saved as content
+@app.exception_handler(llm.LLMError)
+async def llm_error_handler(request, exc: llm.LLMError):
+    headers = {}
+    if exc.retry_after is not None:
+        headers["Retry-After"] = str(max(1, round(exc.retry_after)))
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)}, headers=headers)
+
+
 # =========================================================
 # 3️⃣  HOME ROUTE
 # =========================================================
@@ -65,9 +146,10 @@ def home():
 
 
 # =========================================================
-# 4️⃣  CREATE DATABASE TABLES (AFTER APP + CORS)
+# 4️⃣  DATABASE TABLES
 # =========================================================
-Base.metadata.create_all(bind=engine)
+# Nothing touches the database at import: tables are created and migrated
+# in the lifespan (AUTO_MIGRATE) or by `python -m app.migrations`.
 
 
 # =========================================================
@@ -75,12 +157,13 @@ Base.metadata.create_all(bind=engine)
 # =========================================================
 
 @app.post("/auth/register", response_model=schemas.UserOut)
-def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(models.User).filter(models.User.email == user_in.email).first()
+async def register(user_in: schemas.UserCreate, db = Depends(get_async_db)):
+    existing = await db.scalar(select(models.User.id).where(models.User.email == user_in.email))
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed = auth.get_password_hash(user_in.password)
+    await release_async_connection(db)
+    hashed = await auth.aget_password_hash(user_in.password)
 
     new_user = models.User(
         email=user_in.email,
@@ -89,26 +172,42 @@ def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
 
     return new_user
 
 
 @app.post("/auth/login", response_model=schemas.Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db = Depends(get_async_db)
 ):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
+    user = (await db.execute(
+        select(models.User.id, models.User.hashed_password).where(models.User.email == form_data.username)
+    )).first()
+
+    if not user:
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
 
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    user_id, hashed_password = user
+    await release_async_connection(db)
+
+    valid, new_hash = await auth.averify_and_update(form_data.password, hashed_password)
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
+    # Argon2 parameters changed since this hash was made: upgrade it now
+    if new_hash:
+        await db.execute(
+            update(models.User).where(models.User.id == user_id).values(hashed_password=new_hash)
+        )
+        await db.commit()
+        auth.invalidate_user(user_id)
+
     expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
     token = auth.create_access_token(
-        data={"sub": user.id},
+        data={"sub": user_id},
         expires_delta=expires,
     )
 
@@ -124,21 +223,93 @@ def get_me(current_user: models.User = Depends(auth.get_current_user)):
 # 6️⃣  PROJECT ROUTES
 # =========================================================
 
+# The hot routes are async and take their session from get_async_db (an
+# AsyncSession when DB_ASYNC is on); see database.py for how they use it.
+# Read-only routes use get_async_read_db / get_read_db, which read from the
+# replica when one is configured.
+
+def _owned_project(project_id: int, user_id: int):
+    return select(models.Project).where(
+        models.Project.id == project_id,
+        models.Project.owner_id == user_id,
+        models.Project.deleted_at.is_(None)
+    )
+
+
+def _owned_section(section_id: int, user_id: int):
+    return select(models.Section).join(models.Project).where(
+        models.Section.id == section_id,
+        models.Project.owner_id == user_id,
+        models.Project.deleted_at.is_(None)
+    )
+
+
+def _project_page(db: Session, user_id: int, doc_type: str | None, limit: int | None, cursor: str | None):
+    # Sections are part of ProjectOut: load them in one extra query, not one per project
+    query = db.query(models.Project).options(
+        selectinload(models.Project.sections)
+    ).filter(
+        models.Project.owner_id == user_id,
+        models.Project.deleted_at.is_(None)
+    )
+
+    if doc_type:
+        query = query.filter(models.Project.doc_type == doc_type)
+
+    if limit is None and not cursor:
+        # Unpaginated: oldest first, the order the list had before paging
+        return query.order_by(models.Project.id).all(), None
+
+    return keyset_page(query, models.Project, limit or 2**31 - 1, cursor)
+
+
 @app.get("/projects", response_model=list[schemas.ProjectOut])
-def list_projects(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+async def list_projects(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=100),
+    cursor: str | None = None,
+    doc_type: str | None = None,
+    db = Depends(get_async_read_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
+):
+    # Without `limit` every project is returned, oldest first, as before.
+    # With it, pages run newest first and the cursor for the next page is
+    # sent in X-Next-Cursor.
+    projects, next_cursor = await db.run_sync(
+        _project_page, current_user_id, doc_type, limit, cursor
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return projects
+
+
+@app.get("/search", response_model=schemas.SearchPage)
+def search_projects(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    db: Session = Depends(get_read_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
 ):
-    return db.query(models.Project).filter(
-        models.Project.owner_id == current_user.id
-    ).all()
+    """Ranked full-text search over the user's project titles/topics and section titles/content."""
+    offset = decode_offset_cursor(cursor)
+
+    hits = search.search(db, current_user_id, q, limit + 1, offset)
+
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_offset_cursor(offset + limit)
+
+    return {"items": hits, "next_cursor": next_cursor}
 
 
 @app.post("/projects", response_model=schemas.ProjectOut)
 def create_project(
     project_in: schemas.ProjectCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user_id: int = Depends(auth.get_current_user_id)
 ):
     if project_in.doc_type not in ("docx", "pptx"):
         raise HTTPException(status_code=400, detail="Invalid doc_type")
@@ -147,7 +318,7 @@ def create_project(
         title=project_in.title,
         topic=project_in.topic,
         doc_type=project_in.doc_type,
-        owner_id=current_user.id,
+        owner_id=current_user_id,
     )
 
     db.add(project)
@@ -167,15 +338,14 @@ def create_project(
 
 
 @app.get("/projects/{project_id}", response_model=schemas.ProjectOut)
-def get_project(
+async def get_project(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db = Depends(get_async_read_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
 ):
-    project = db.query(models.Project).filter(
-        models.Project.id == project_id,
-        models.Project.owner_id == current_user.id
-    ).first()
+    project = await db.scalar(
+        _owned_project(project_id, current_user_id).options(selectinload(models.Project.sections))
+    )
 
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -185,123 +355,277 @@ def get_project(
 @app.delete("/projects/{project_id}")
 def delete_project(
     project_id: int,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user_id: int = Depends(auth.get_current_user_id)
 ):
-    # 1. Load the project
-    project = db.query(models.Project).filter(
+    query = db.query(models.Project).filter(
         models.Project.id == project_id,
-        models.Project.owner_id == current_user.id
-    ).first()
+        models.Project.owner_id == current_user_id,
+        models.Project.deleted_at.is_(None)
+    )
 
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    if background:
+        # Hide the project now; its rows are purged after the response is sent
+        deleted = query.update({"deleted_at": datetime.utcnow()}, synchronize_session=False)
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Project not found")
 
-    # 2. Find all sections in this project
-    sections = db.query(models.Section).filter(
-        models.Section.project_id == project_id
-    ).all()
+        db.commit()
+        background_tasks.add_task(jobs.purge_project, project_id)
 
-    section_ids = [s.id for s in sections]
+        response.status_code = 202
+        return {"message": "Project scheduled for deletion"}
 
-    # 3. DELETE comments for each section
-    db.query(models.Comment).filter(
-        models.Comment.section_id.in_(section_ids)
-    ).delete(synchronize_session=False)
+    # One statement: ON DELETE CASCADE removes sections, history, comments and jobs
+    deleted = query.delete(synchronize_session=False)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Project not found")
 
-    # 4. DELETE refinement history for each section
-    db.query(models.RefinementHistory).filter(
-        models.RefinementHistory.section_id.in_(section_ids)
-    ).delete(synchronize_session=False)
+    db.commit()
 
-    # 5. DELETE sections
-    db.query(models.Section).filter(
-        models.Section.project_id == project_id
-    ).delete(synchronize_session=False)
+    return {"message": "Project and all related data deleted successfully"}
 
-    # 6. DELETE the project
-    db.delete(project)
+async def _generate_sections(
+    project_id: int,
+    section_ids: list[int],
+    section_titles: list[str],
+    topic: str,
+    contexts: list,
+    fresh: bool,
+    use_batch: bool,
+    user_id: int,
+) -> None:
+    # All LLM calls run concurrently; the DB is only touched once they are done
+    if use_batch:
+        # One JSON prompt per LLM_BATCH_SIZE sections, per-section fallback
+        results = await llm.agenerate_batch(
+            section_titles=section_titles,
+            topic=topic,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            batch_size=settings.LLM_BATCH_SIZE,
+            fresh=fresh,
+            contexts=contexts,
+            user_id=user_id,
+        )
+    else:
+        results = await llm.agenerate_many(
+            section_titles=section_titles,
+            topic=topic,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            fresh=fresh,
+            contexts=contexts,
+            user_id=user_id,
+        )
 
+    # Own session: the run is shared by every coalesced request
+    db = async_session()
+    try:
+        # A failed section keeps its old content and gets no history row
+        await db.run_sync(_save_generated, {
+            section_id: new_text
+            for section_id, new_text in zip(section_ids, results)
+            if new_text is not None
+        })
+    finally:
+        await db.close()
+
+
+@history.retry_revision_conflicts
+def _save_generated(db: Session, results: dict[int, str]) -> None:
+    # One query loads every section with its current content
+    history.record_revisions(db, (
+        (sec, results[sec.id], "Initial generation")
+        for sec in db.query(models.Section).filter(
+            models.Section.id.in_(list(results))
+        )
+    ))
     db.commit()
 
-    return {"message": "Project and all related data deleted successfully"}
 
 @app.post("/projects/{project_id}/generate", response_model=schemas.ProjectOut)
-def generate_project(
+async def generate_project(
+    project_id: int,
+    fresh: bool = False,
+    batch: bool | None = None,
+    idempotency_key: str | None = Header(None),
+    db = Depends(get_async_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
+):
+    project = await db.scalar(_owned_project(project_id, current_user_id))
+
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    use_batch = settings.LLM_BATCH_GENERATION if batch is None else batch
+    claim = await db.run_sync(
+        idempotency.begin, current_user_id, idempotency_key,
+        idempotency.fingerprint("generate", project_id, fresh, use_batch),
+    )
+    if claim is not None and claim.status_code is not None:
+        return idempotency.replay(claim)
+
+    try:
+        sections = (await db.scalars(
+            select(models.Section).where(
+                models.Section.project_id == project.id
+            ).order_by(models.Section.order)
+        )).all()
+
+        section_ids = [sec.id for sec in sections]
+        section_titles = [sec.title for sec in sections]
+        topic = project.topic
+
+        # Related passages from sibling sections that already have content
+        contexts = await retrieval.agenerate_contexts(project.id, sections, topic)
+
+        # Don't hold a pooled connection for the whole Gemini round-trip
+        await release_async_connection(db)
+
+        # Concurrent duplicates (double-clicks, client retries) share one run
+        await flights.run(
+            ("generate", project_id, fresh, use_batch),
+            lambda: _generate_sections(
+                project_id, section_ids, section_titles, topic, contexts,
+                fresh, use_batch, current_user_id,
+            ),
+        )
+
+        project = await db.scalar(
+            select(models.Project).options(
+                selectinload(models.Project.sections)
+            ).where(
+                models.Project.id == project_id
+            ).execution_options(populate_existing=True)
+        )
+        body = schemas.ProjectOut.model_validate(project, from_attributes=True)
+    except Exception:
+        await db.run_sync(idempotency.abandon, claim)
+        raise
+
+    await db.run_sync(idempotency.complete, claim, 200, body)
+    return body
+
+
+@app.post("/projects/{project_id}/jobs", response_model=schemas.JobOut, status_code=202)
+def submit_generate_job(
     project_id: int,
+    fresh: bool = False,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user_id: int = Depends(auth.get_current_user_id)
 ):
-    project = db.query(models.Project).filter(
+    project = db.query(models.Project).options(
+        selectinload(models.Project.sections)
+    ).filter(
         models.Project.id == project_id,
-        models.Project.owner_id == current_user.id
+        models.Project.owner_id == current_user_id,
+        models.Project.deleted_at.is_(None)
     ).first()
 
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    sections = db.query(models.Section).filter(
-        models.Section.project_id == project.id
-    ).all()
+    return jobs.submit_generation_job(db, project, fresh=fresh)
 
-    for sec in sections:
-        new_text = llm.generate_llm_content(
-            section_title=sec.title,
-            topic=project.topic
-        )
 
-        db.add(models.RefinementHistory(
-            section_id=sec.id,
-            old_content=sec.content,
-            new_content=new_text,
-            prompt="Initial generation",
-        ))
-
-        sec.content = new_text
+@app.get("/jobs/{job_id}", response_model=schemas.JobOut)
+async def get_job(
+    job_id: int,
+    db = Depends(get_async_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
+):
+    job = await db.run_sync(jobs.get_job, job_id, current_user_id)
 
-    db.commit()
-    db.refresh(project)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
 
-    return project
+    return job
 
 
 # =========================================================
 # 7️⃣  SECTION REFINEMENT + COMMENTS + FEEDBACK
 # =========================================================
 
+async def _refine_section(
+    section_id: int,
+    current_content: str,
+    prompt: str,
+    fresh: bool,
+    context: str | None,
+    user_id: int,
+) -> None:
+    # An LLMError propagates (503/429) and nothing is saved
+    new_text = await llm.arefine_llm_content(
+        current_content=current_content,
+        prompt=prompt,
+        fresh=fresh,
+        context=context,
+        user_id=user_id,
+    )
+
+    # Own session: the run is shared by every coalesced request
+    db = async_session()
+    try:
+        await db.run_sync(_save_refined, section_id, new_text, prompt)
+    finally:
+        await db.close()
+
+
+@history.retry_revision_conflicts
+def _save_refined(db: Session, section_id: int, new_text: str, prompt: str) -> models.Section | None:
+    section = db.get(models.Section, section_id)
+    if section is None:
+        return None  # deleted while Gemini was busy
+    history.record_revision(db, section, new_text, prompt)
+    db.commit()
+    return section
+
+
 @app.post("/sections/{section_id}/refine", response_model=schemas.SectionOut)
-def refine_section(
+async def refine_section(
     section_id: int,
     req: schemas.RefinementRequest,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    idempotency_key: str | None = Header(None),
+    db = Depends(get_async_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
 ):
-    section = db.query(models.Section).join(models.Project).filter(
-        models.Section.id == section_id,
-        models.Project.owner_id == current_user.id
-    ).first()
+    section = await db.scalar(_owned_section(section_id, current_user_id))
 
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
 
-    new_text = llm.refine_llm_content(
-        current_content=section.content or "",
-        prompt=req.prompt
+    claim = await db.run_sync(
+        idempotency.begin, current_user_id, idempotency_key,
+        idempotency.fingerprint("refine", section_id, req.prompt, req.fresh),
     )
+    if claim is not None and claim.status_code is not None:
+        return idempotency.replay(claim)
+
+    try:
+        current_content = section.content or ""
+        context = await retrieval.arefine_context(db, section, req.prompt)
+        await release_async_connection(db)
+
+        # Concurrent duplicates (double-clicks, client retries) share one run
+        await flights.run(
+            ("refine", section_id, req.prompt, req.fresh),
+            lambda: _refine_section(
+                section_id, current_content, req.prompt, req.fresh, context, current_user_id,
+            ),
+        )
 
-    db.add(models.RefinementHistory(
-        section_id=section.id,
-        old_content=section.content,
-        new_content=new_text,
-        prompt=req.prompt,
-    ))
+        section = await db.get(models.Section, section_id, populate_existing=True)
+        if not section:
+            raise HTTPException(status_code=404, detail="Section not found")
+        body = schemas.SectionOut.model_validate(section, from_attributes=True)
+    except Exception:
+        await db.run_sync(idempotency.abandon, claim)
+        raise
 
-    section.content = new_text
-
-    db.commit()
-    db.refresh(section)
-
-    return section
+    await db.run_sync(idempotency.complete, claim, 200, body)
+    return body
 
 
 @app.post("/sections/{section_id}/feedback")
@@ -309,11 +633,12 @@ def save_feedback(
     section_id: int,
     req: schemas.FeedbackRequest,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user_id: int = Depends(auth.get_current_user_id)
 ):
     section = db.query(models.Section).join(models.Project).filter(
         models.Section.id == section_id,
-        models.Project.owner_id == current_user.id
+        models.Project.owner_id == current_user_id,
+        models.Project.deleted_at.is_(None)
     ).first()
 
     if not section:
@@ -335,11 +660,12 @@ def save_comment(
     section_id: int,
     req: schemas.CommentRequest,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user_id: int = Depends(auth.get_current_user_id)
 ):
     section = db.query(models.Section).join(models.Project).filter(
         models.Section.id == section_id,
-        models.Project.owner_id == current_user.id
+        models.Project.owner_id == current_user_id,
+        models.Project.deleted_at.is_(None)
     ).first()
 
     if not section:
@@ -355,20 +681,171 @@ def save_comment(
     return {"message": "Comment added"}
 
 
+def _get_owned_section(db: Session, section_id: int, user_id: int) -> models.Section:
+    section = db.query(models.Section).join(models.Project).filter(
+        models.Section.id == section_id,
+        models.Project.owner_id == user_id,
+        models.Project.deleted_at.is_(None)
+    ).first()
+
+    if not section:
+        raise HTTPException(status_code=404, detail="Section not found")
+
+    return section
+
+
+def _history_page(db: Session, section_id: int, user_id: int, limit: int, cursor: str | None, liked: bool | None):
+    _get_owned_section(db, section_id, user_id)
+
+    query = db.query(models.RefinementHistory).filter(
+        models.RefinementHistory.section_id == section_id
+    )
+
+    if liked is not None:
+        query = query.filter(models.RefinementHistory.liked == liked)
+
+    items, next_cursor = keyset_page(query, models.RefinementHistory, limit, cursor)
+    history.attach_contents(db, section_id, items)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@app.get("/sections/{section_id}/history", response_model=schemas.HistoryPage)
+async def list_history(
+    section_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    liked: bool | None = None,
+    db = Depends(get_async_read_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
+):
+    return await db.run_sync(_history_page, section_id, current_user_id, limit, cursor, liked)
+
+
+@app.get("/sections/{section_id}/revisions/{revision}", response_model=schemas.HistoryOut)
+def get_revision(
+    section_id: int,
+    revision: int,
+    db: Session = Depends(get_read_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
+):
+    _get_owned_section(db, section_id, current_user_id)
+
+    row = db.query(models.RefinementHistory).filter(
+        models.RefinementHistory.section_id == section_id,
+        models.RefinementHistory.revision == revision
+    ).first()
+
+    if not row:
+        raise HTTPException(status_code=404, detail="Revision not found")
+
+    history.attach_contents(db, section_id, [row])
+    return row
+
+
+@app.get("/sections/{section_id}/diff", response_model=schemas.RevisionDiff)
+def diff_section_revisions(
+    section_id: int,
+    from_revision: int = Query(..., ge=0),
+    to_revision: int = Query(..., ge=0),
+    db: Session = Depends(get_read_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
+):
+    """Unified diff between two revisions; revision 0 is the content before the first one."""
+    _get_owned_section(db, section_id, current_user_id)
+
+    wanted = {max(from_revision, 1), max(to_revision, 1)}
+    contents = history.load_revisions(db, section_id, wanted)
+    if len(contents) != len(wanted):
+        raise HTTPException(status_code=404, detail="Revision not found")
+
+    def content_of(revision: int):
+        old, new = contents[max(revision, 1)]
+        return old if revision == 0 else new
+
+    return {
+        "from_revision": from_revision,
+        "to_revision": to_revision,
+        "diff": history.diff_revisions(
+            content_of(from_revision),
+            content_of(to_revision),
+            f"revision {from_revision}",
+            f"revision {to_revision}",
+        ),
+    }
+
+
+@app.get("/sections/{section_id}/comments", response_model=schemas.CommentPage)
+def list_comments(
+    section_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    db: Session = Depends(get_read_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
+):
+    _get_owned_section(db, section_id, current_user_id)
+
+    query = db.query(models.Comment).filter(
+        models.Comment.section_id == section_id
+    )
+
+    items, next_cursor = keyset_page(query, models.Comment, limit, cursor)
+    return {"items": items, "next_cursor": next_cursor}
+
+
 # =========================================================
 # 8️⃣  EXPORT ROUTES — DOCX + PPTX
 # =========================================================
+# Rendered files are cached under a fingerprint of the project content,
+# which doubles as the ETag, so unchanged re-downloads get a 304.
+# Rendering runs in the export pool into a spooled temp file; results that
+# spilled to disk are streamed in chunks instead of being cached in memory.
+
+async def _export_response(project, media_type: str, if_none_match):
+    fingerprint = export_cache.project_fingerprint(project)
+    etag = f'"{fingerprint}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if export_cache.etag_matches(if_none_match, etag):
+        metrics.EXPORT_REQUESTS.labels(project.doc_type, "not_modified").inc()
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = f'attachment; filename="{project.title}.{project.doc_type}"'
+
+    data = export_cache.export_cache.get(fingerprint)
+    if data is not None:
+        metrics.EXPORT_REQUESTS.labels(project.doc_type, "cached").inc()
+        return Response(content=data, headers=headers, media_type=media_type)
+
+    metrics.EXPORT_REQUESTS.labels(project.doc_type, "rendered").inc()
+
+    file, size = await export_pipeline.render(
+        project.doc_type, export_pipeline.snapshot_project(project)
+    )
+
+    if size <= settings.EXPORT_SPOOL_MAX_BYTES:
+        with file:
+            data = file.read()
+        export_cache.export_cache.set(fingerprint, data)
+        return Response(content=data, headers=headers, media_type=media_type)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(
+        export_pipeline.iter_file(file), headers=headers, media_type=media_type
+    )
+
 
 @app.get("/projects/{project_id}/export/docx")
-def export_docx(
+async def export_docx(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    if_none_match: str | None = Header(None),
+    db = Depends(get_async_read_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
 ):
-    project = db.query(models.Project).filter(
-        models.Project.id == project_id,
-        models.Project.owner_id == current_user.id
-    ).first()
+    project = await db.scalar(
+        _owned_project(project_id, current_user_id).options(
+            selectinload(models.Project.sections).undefer(models.Section.blocks)
+        )
+    )
 
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -376,25 +853,25 @@ def export_docx(
     if project.doc_type != "docx":
         raise HTTPException(status_code=400, detail="Project type is not docx")
 
-    stream = docx_export.build_docx(project)
-
-    return StreamingResponse(
-        stream,
-        headers={"Content-Disposition": f'attachment; filename="{project.title}.docx"'},
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    return await _export_response(
+        project,
+        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        if_none_match=if_none_match,
     )
 
 
 @app.get("/projects/{project_id}/export/pptx")
-def export_pptx(
+async def export_pptx(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    if_none_match: str | None = Header(None),
+    db = Depends(get_async_read_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
 ):
-    project = db.query(models.Project).filter(
-        models.Project.id == project_id,
-        models.Project.owner_id == current_user.id
-    ).first()
+    project = await db.scalar(
+        _owned_project(project_id, current_user_id).options(
+            selectinload(models.Project.sections).undefer(models.Section.blocks)
+        )
+    )
 
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -402,10 +879,158 @@ def export_pptx(
     if project.doc_type != "pptx":
         raise HTTPException(status_code=400, detail="Project type is not pptx")
 
-    stream = pptx_export.build_pptx(project)
-
-    return StreamingResponse(
-        stream,
-        headers={"Content-Disposition": f'attachment; filename="{project.title}.pptx"'},
-        media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation"
+    return await _export_response(
+        project,
+        media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        if_none_match=if_none_match,
     )
+
+
+# =========================================================
+# 9️⃣  LLM CACHE STATS + METRICS
+# =========================================================
+
+@app.get("/llm/cache/stats")
+def llm_cache_stats(current_user_id: int = Depends(auth.get_current_user_id)):
+    return llm.response_cache.stats()
+
+
+# Prometheus scrape target, off unless METRICS_ENABLED=true. The API allows
+# any origin, so set METRICS_TOKEN too unless the endpoint is only reachable
+# from the scraper's network.
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(authorization: str | None = Header(None)):
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.METRICS_TOKEN and not secrets.compare_digest(
+        authorization or "", f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# =========================================================
+# 🔟  STREAMING ROUTES (SERVER-SENT EVENTS)
+# =========================================================
+# Tokens are pushed as `data:` events while Gemini is still writing.
+# The final text is persisted only once the stream has completed, using a
+# fresh session because the request session may already be closed.
+
+def _sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def _sse_error(error: Exception) -> dict:
+    if not isinstance(error, llm.LLMError):
+        return {"error": llm.FAILURE_MESSAGE, "status": 503}
+    return {"error": str(error), "status": error.status_code, "retry_after": error.retry_after}
+
+
+@app.post("/projects/{project_id}/generate/stream")
+async def generate_project_stream(
+    project_id: int,
+    fresh: bool = False,
+    db = Depends(get_async_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
+):
+    project = await db.scalar(_owned_project(project_id, current_user_id))
+
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    sections = (await db.scalars(
+        select(models.Section).where(models.Section.project_id == project.id)
+    )).all()
+
+    section_ids = [sec.id for sec in sections]
+    section_titles = [sec.title for sec in sections]
+    topic = project.topic
+    contexts = await retrieval.agenerate_contexts(project.id, sections, topic)
+    await release_async_connection(db)
+
+    async def event_stream():
+        results = {}
+
+        async for index, kind, payload in llm.astream_generate_many(
+            section_titles=section_titles,
+            topic=topic,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            fresh=fresh,
+            contexts=contexts,
+            user_id=current_user_id,
+        ):
+            data = {"section_id": section_ids[index]}
+            if kind == "delta":
+                yield _sse({**data, "delta": payload})
+            elif kind == "done":
+                results[section_ids[index]] = payload
+                yield _sse({**data, "content": payload}, event="section_done")
+            else:
+                yield _sse({**data, **_sse_error(payload)}, event="section_error")
+
+        # Persist every finished section in one batch
+        session = async_session()
+        try:
+            await session.run_sync(_save_generated, results)
+        finally:
+            await session.close()
+
+        yield _sse({"project_id": project_id, "generated": len(results)}, event="done")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post("/sections/{section_id}/refine/stream")
+async def refine_section_stream(
+    section_id: int,
+    req: schemas.RefinementRequest,
+    db = Depends(get_async_db),
+    current_user_id: int = Depends(auth.get_current_user_id)
+):
+    section = await db.scalar(_owned_section(section_id, current_user_id))
+
+    if not section:
+        raise HTTPException(status_code=404, detail="Section not found")
+
+    current_content = section.content or ""
+    context = await retrieval.arefine_context(db, section, req.prompt)
+    await release_async_connection(db)
+
+    async def event_stream():
+        parts = []
+        try:
+            async for delta in llm.astream_refine(
+                current_content=current_content,
+                prompt=req.prompt,
+                fresh=req.fresh,
+                context=context,
+                user_id=current_user_id,
+            ):
+                parts.append(delta)
+                yield _sse({"delta": delta})
+        except Exception as e:
+            print("LLM ERROR:", e)
+            yield _sse(_sse_error(e), event="error")
+            return
+
+        new_text = "".join(parts)
+
+        session = async_session()
+        try:
+            sec = await session.run_sync(_save_refined, section_id, new_text, req.prompt)
+        finally:
+            await session.close()
+
+        if sec is None:
+            yield _sse({"detail": "Section not found"}, event="error")
+            return
+
+        yield _sse({
+            "id": sec.id,
+            "title": sec.title,
+            "order": sec.order,
+            "content": sec.content,
+        }, event="done")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
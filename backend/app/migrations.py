@@ -0,0 +1,297 @@
+# backend/app/migrations.py
+#
+# Minimal schema migrations for databases created before a model change.
+# `Base.metadata.create_all` only creates missing tables, so anything added
+# to an existing table (indexes, columns, constraints) is applied here.
+# Every migration must be idempotent: on a fresh database create_all has
+# usually produced the final schema already.
+#
+# `migrate` creates missing tables and then applies pending migrations. The
+# app runs it at startup when AUTO_MIGRATE is on (the default); for faster
+# cold starts turn that off and run it as a deploy step instead:
+#
+#   python -m app.migrations   (from backend/)
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, bindparam, inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import AddConstraint, CreateColumn, CreateTable
+
+from .database import Base, engine as default_engine
+from . import blocks, models, history, search
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("id", String(64), primary_key=True),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+MIGRATIONS = []
+
+
+def migration(migration_id: str):
+    def register(fn):
+        MIGRATIONS.append((migration_id, fn))
+        return fn
+    return register
+
+
+# ---------------------------------------------------
+# HELPERS
+# ---------------------------------------------------
+def _index(model, name: str):
+    return next(ix for ix in model.__table__.indexes if ix.name == name)
+
+
+def _create_index_if_missing(conn: Connection, index) -> None:
+    existing = {ix["name"] for ix in inspect(conn).get_indexes(index.table.name)}
+    if index.name not in existing:
+        index.create(conn)
+
+
+def _quote(conn: Connection, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _add_column_if_missing(conn: Connection, column) -> None:
+    table = column.table
+    existing = {col["name"] for col in inspect(conn).get_columns(table.name)}
+    if column.name not in existing:
+        ddl = CreateColumn(column).compile(dialect=conn.dialect)
+        conn.exec_driver_sql(f"ALTER TABLE {_quote(conn, table.name)} ADD COLUMN {ddl}")
+
+
+def _missing_cascades(conn: Connection, table) -> list[dict]:
+    """Reflected foreign keys of `table` that the model declares ON DELETE CASCADE but the database does not."""
+    wanted = {
+        tuple(fk.column_keys)
+        for fk in table.foreign_key_constraints
+        if (fk.ondelete or "").upper() == "CASCADE"
+    }
+    return [
+        fk for fk in inspect(conn).get_foreign_keys(table.name)
+        if tuple(fk["constrained_columns"]) in wanted
+        and (fk.get("options", {}).get("ondelete") or "").upper() != "CASCADE"
+    ]
+
+
+def _rebuild_sqlite_table(conn: Connection, table) -> None:
+    # SQLite cannot alter a constraint, so the table is recreated and the
+    # rows copied over (https://sqlite.org/lang_altertable.html). The copy is
+    # built from the table as it is now, with only the model's ON DELETE
+    # rules applied: columns the model no longer has may still be needed by a
+    # later migration, and ones it has gained are added by their own.
+    current = Table(table.name, MetaData(), autoload_with=conn)
+    ondelete = {tuple(fk.column_keys): fk.ondelete for fk in table.foreign_key_constraints}
+    for fk in current.foreign_key_constraints:
+        fk.ondelete = ondelete.get(tuple(fk.column_keys), fk.ondelete)
+
+    columns = ", ".join(_quote(conn, c.name) for c in current.columns)
+    name = _quote(conn, table.name)
+    tmp = _quote(conn, f"_new_{table.name}")
+
+    # Dropping the old table would otherwise trip (or cascade through) its
+    # children. The pragma is a no-op inside a transaction, so it only takes
+    # effect before the migration's first write; the connection is detached
+    # so it is closed afterwards instead of going back to the pool like this.
+    conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    conn.detach()
+
+    ddl = str(CreateTable(current).compile(dialect=conn.dialect))
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {tmp}")
+    conn.exec_driver_sql(ddl.replace(f"CREATE TABLE {name}", f"CREATE TABLE {tmp}", 1))
+    conn.exec_driver_sql(f"INSERT INTO {tmp} ({columns}) SELECT {columns} FROM {name}")
+    conn.exec_driver_sql(f"DROP TABLE {name}")
+    conn.exec_driver_sql(f"ALTER TABLE {tmp} RENAME TO {name}")
+
+    for index in current.indexes:
+        index.create(conn)
+
+
+def _add_cascades(conn: Connection, table) -> None:
+    missing = _missing_cascades(conn, table)
+    if not missing:
+        return
+
+    if conn.dialect.name == "sqlite":
+        _rebuild_sqlite_table(conn, table)
+        return
+
+    drop = "DROP FOREIGN KEY" if conn.dialect.name == "mysql" else "DROP CONSTRAINT"
+    for reflected in missing:
+        conn.exec_driver_sql(
+            f"ALTER TABLE {_quote(conn, table.name)} {drop} {_quote(conn, reflected['name'])}"
+        )
+        fk = next(
+            fk for fk in table.foreign_key_constraints
+            if list(fk.column_keys) == reflected["constrained_columns"]
+        )
+        conn.execute(AddConstraint(fk))
+
+
+# ---------------------------------------------------
+# MIGRATIONS (in order)
+# ---------------------------------------------------
+@migration("0001_keyset_pagination_indexes")
+def add_keyset_indexes(conn: Connection) -> None:
+    for model, name in (
+        (models.Project, "ix_projects_owner_created"),
+        (models.RefinementHistory, "ix_refinement_history_section_created"),
+        (models.Comment, "ix_comments_section_created"),
+    ):
+        _create_index_if_missing(conn, _index(model, name))
+
+
+@migration("0002_cascading_deletes")
+def add_cascading_deletes(conn: Connection) -> None:
+    # Parents before children, so a rebuilt (SQLite) parent is never dropped
+    # while a child already cascades from it
+    for model in (models.Section, models.Job, models.RefinementHistory, models.Comment, models.JobItem):
+        _add_cascades(conn, model.__table__)
+
+    _add_column_if_missing(conn, models.Project.__table__.c.deleted_at)
+    _create_index_if_missing(conn, _index(models.Project, "ix_projects_deleted_at"))
+
+
+@migration("0003_delta_history")
+def compact_refinement_history(conn: Connection) -> None:
+    table = models.RefinementHistory.__table__
+    for column in ("revision", "is_snapshot", "delta", "base_content"):
+        _add_column_if_missing(conn, table.c[column])
+
+    legacy = Table("refinement_history", MetaData(), autoload_with=conn)
+    if "new_content" in legacy.c:
+        _compact_history_rows(conn, legacy)
+        for column in ("old_content", "new_content"):
+            conn.exec_driver_sql(
+                f"ALTER TABLE {_quote(conn, table.name)} DROP COLUMN {_quote(conn, column)}"
+            )
+
+    _create_index_if_missing(conn, _index(models.RefinementHistory, "ix_refinement_history_section_revision"))
+
+
+def _compact_history_rows(conn: Connection, legacy: Table, batch_size: int = 1000) -> None:
+    # Full old/new texts -> numbered revisions with deltas, replayed per
+    # section in creation order. A row whose old text is not the previous
+    # row's new text keeps it as base_content.
+    update = legacy.update().where(legacy.c.id == bindparam("row_id")).values(
+        revision=bindparam("new_revision"),
+        is_snapshot=bindparam("new_is_snapshot"),
+        delta=bindparam("new_delta"),
+        base_content=bindparam("new_base_content"),
+    )
+
+    section_ids = [row[0] for row in conn.execute(
+        legacy.select().with_only_columns(legacy.c.section_id).distinct()
+    )]
+
+    pending = []
+    for section_id in section_ids:
+        rows = conn.execute(
+            legacy.select().with_only_columns(
+                legacy.c.id, legacy.c.old_content, legacy.c.new_content
+            ).where(legacy.c.section_id == section_id).order_by(legacy.c.created_at, legacy.c.id)
+        ).fetchall()
+
+        previous = None
+        last_snapshot = 0
+        for revision, (row_id, old, new) in enumerate(rows, start=1):
+            new = new or ""
+            is_snapshot, delta = history.encode_revision(
+                old, new, revision - last_snapshot if last_snapshot else None
+            )
+            if is_snapshot:
+                last_snapshot = revision
+
+            pending.append({
+                "row_id": row_id,
+                "new_revision": revision,
+                "new_is_snapshot": is_snapshot,
+                "new_delta": delta,
+                "new_base_content": (old or "") if old != previous else None,
+            })
+            previous = new
+
+        if len(pending) >= batch_size:
+            conn.execute(update, pending)
+            pending = []
+
+    if pending:
+        conn.execute(update, pending)
+
+
+@migration("0004_search_index")
+def add_search_index(conn: Connection) -> None:
+    if conn.dialect.name == "sqlite":
+        for statement in search.SQLITE_SCHEMA:
+            conn.exec_driver_sql(statement)
+
+    elif conn.dialect.name == "mysql":
+        for name, (table, columns) in search.MYSQL_INDEXES.items():
+            existing = {ix["name"] for ix in inspect(conn).get_indexes(table)}
+            if name not in existing:
+                conn.exec_driver_sql(f"CREATE FULLTEXT INDEX {name} ON {table} ({columns})")
+
+
+@migration("0005_section_blocks")
+def add_section_blocks(conn: Connection, batch_size: int = 1000) -> None:
+    # Parse the content of existing sections once, in id order
+    table = models.Section.__table__
+    _add_column_if_missing(conn, table.c.blocks)
+
+    update = table.update().where(table.c.id == bindparam("row_id")).values(
+        blocks=bindparam("new_blocks", type_=table.c.blocks.type)
+    )
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            table.select().with_only_columns(table.c.id, table.c.content).where(
+                table.c.id > last_id,
+                table.c.blocks.is_(None),
+                table.c.content.is_not(None),
+            ).order_by(table.c.id).limit(batch_size)
+        ).fetchall()
+        if not rows:
+            break
+
+        conn.execute(update, [
+            {"row_id": row_id, "new_blocks": blocks.parse_blocks(content)} for row_id, content in rows
+        ])
+        last_id = rows[-1][0]
+
+
+# ---------------------------------------------------
+# RUNNER
+# ---------------------------------------------------
+def run_migrations(engine: Engine = default_engine) -> list[str]:
+    migration_metadata.create_all(bind=engine)
+
+    with engine.connect() as conn:
+        applied = {row[0] for row in conn.execute(schema_migrations.select())}
+
+    newly_applied = []
+    for migration_id, fn in MIGRATIONS:
+        if migration_id in applied:
+            continue
+
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(schema_migrations.insert().values(id=migration_id))
+        newly_applied.append(migration_id)
+
+    return newly_applied
+
+
+def migrate(engine: Engine = default_engine) -> list[str]:
+    """Create missing tables, then apply pending migrations."""
+    Base.metadata.create_all(bind=engine)
+    return run_migrations(engine)
+
+
+if __name__ == "__main__":
+    for migration_id in migrate():
+        print("applied", migration_id)
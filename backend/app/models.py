@@ -1,7 +1,8 @@
 # backend/app/models.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index, LargeBinary, JSON
+from sqlalchemy.orm import deferred, relationship, validates
 from datetime import datetime
+from .blocks import parse_blocks
 from .database import Base
 
 class User(Base):
@@ -24,9 +25,16 @@ class Project(Base):
     doc_type = Column(String(10), nullable=False)  # "docx" or "pptx"
     created_at = Column(DateTime, default=datetime.utcnow)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    deleted_at = Column(DateTime, nullable=True, index=True)  # soft-deleted, waiting to be purged
 
     owner = relationship("User", back_populates="projects")
-    sections = relationship("Section", back_populates="project", cascade="all, delete-orphan")
+    # Child rows are removed by ON DELETE CASCADE in the database, not loaded and deleted one by one
+    sections = relationship("Section", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
+
+    # Keyset pagination: WHERE owner_id = ? ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        Index("ix_projects_owner_created", "owner_id", "created_at", "id"),
+    )
 
 class Section(Base):
     __tablename__ = "sections"
@@ -35,31 +43,120 @@ class Section(Base):
     title = Column(String(255), nullable=False)
     order = Column(Integer, nullable=False)
     content = Column(Text, nullable=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
+    # `content` parsed into headings/paragraphs/lists (see blocks.py); only
+    # exports read it, so it is not loaded unless asked for
+    blocks = deferred(Column(JSON, nullable=True))
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
 
     project = relationship("Project", back_populates="sections")
-    refinements = relationship("RefinementHistory", back_populates="section", cascade="all, delete-orphan")
-    comments = relationship("Comment", back_populates="section", cascade="all, delete-orphan")
+    refinements = relationship("RefinementHistory", back_populates="section", cascade="all, delete-orphan", passive_deletes=True)
+    comments = relationship("Comment", back_populates="section", cascade="all, delete-orphan", passive_deletes=True)
+
+    @validates("content")
+    def _parse_content(self, key, content):
+        # Parsed once here, whenever content is saved, never at export time
+        self.blocks = parse_blocks(content) if content is not None else None
+        return content
 
 class RefinementHistory(Base):
     __tablename__ = "refinement_history"
 
     id = Column(Integer, primary_key=True, index=True)
-    section_id = Column(Integer, ForeignKey("sections.id"))
-    old_content = Column(Text, nullable=True)
-    new_content = Column(Text, nullable=True)
+    section_id = Column(Integer, ForeignKey("sections.id", ondelete="CASCADE"))
+    revision = Column(Integer, nullable=True)  # 1, 2, ... per section
+    is_snapshot = Column(Boolean, nullable=True, default=False)
+    delta = Column(LargeBinary, nullable=True)  # zlib'd full text or edit script, see history.py
+    base_content = Column(Text, nullable=True)  # only when the base is not the previous revision
     prompt = Column(Text, nullable=True)
     liked = Column(Boolean, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     section = relationship("Section", back_populates="refinements")
 
+    # Not stored: filled in by history.attach_contents()
+    old_content = None
+    new_content = None
+
+    __table_args__ = (
+        Index("ix_refinement_history_section_created", "section_id", "created_at", "id"),
+        Index("ix_refinement_history_section_revision", "section_id", "revision", unique=True),
+    )
+
 class Comment(Base):
     __tablename__ = "comments"
 
     id = Column(Integer, primary_key=True, index=True)
-    section_id = Column(Integer, ForeignKey("sections.id"))
+    section_id = Column(Integer, ForeignKey("sections.id", ondelete="CASCADE"))
     text = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     section = relationship("Section", back_populates="comments")
+
+    __table_args__ = (
+        Index("ix_comments_section_created", "section_id", "created_at", "id"),
+    )
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending / running / done / failed
+    fresh = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    items = relationship("JobItem", back_populates="job", cascade="all, delete-orphan", passive_deletes=True)
+
+    @property
+    def total(self):
+        return len(self.items)
+
+    @property
+    def completed(self):
+        return sum(1 for item in self.items if item.status == "done")
+
+    @property
+    def failed(self):
+        return sum(1 for item in self.items if item.status == "failed")
+
+class JobItem(Base):
+    __tablename__ = "job_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"))
+    section_id = Column(Integer, ForeignKey("sections.id", ondelete="CASCADE"))
+    status = Column(String(20), nullable=False, default="pending")  # pending / done / failed
+    error = Column(Text, nullable=True)
+
+    job = relationship("Job", back_populates="items")
+    section = relationship("Section")
+
+    @property
+    def title(self):
+        return self.section.title if self.section else None
+
+    @property
+    def content(self):
+        # Only expose the generated text once this item has finished
+        if self.status == "done" and self.section:
+            return self.section.content
+        return None
+
+class IdempotencyKey(Base):
+    """A client-supplied Idempotency-Key and the response it produced (see idempotency.py)."""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # route, ids and payload of the first request
+    status_code = Column(Integer, nullable=True)  # None while the first request is still running
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        Index("ix_idempotency_keys_owner_key", "owner_id", "key", unique=True),
+    )
@@ -1,9 +1,12 @@
 # backend/app/pptx_export.py
 from io import BytesIO
+from typing import BinaryIO, Optional
 from pptx import Presentation
+from .blocks import section_blocks
 from .models import Project
 
-def build_pptx(project: Project) -> BytesIO:
+def build_pptx(project: Project, file_stream: Optional[BinaryIO] = None) -> BinaryIO:
+    # `project` may be an ORM Project or an export_pipeline.ExportProject snapshot
     prs = Presentation()
 
     # Title slide
@@ -18,10 +21,23 @@ def build_pptx(project: Project) -> BytesIO:
     for section in sorted(project.sections, key=lambda s: s.order):
         slide = prs.slides.add_slide(content_layout)
         slide.shapes.title.text = section.title
-        body = slide.placeholders[1]
-        body.text = section.content or ""
+        body = slide.placeholders[1].text_frame
+        body.text = ""
 
-    file_stream = BytesIO()
+        # Headings bold, paragraphs at the top level, list items indented
+        paragraphs = 0
+        for kind, content in section_blocks(section):
+            items = content if kind in ("ul", "ol") else [content]
+            for i, item in enumerate(items, start=1):
+                para = body.paragraphs[0] if paragraphs == 0 else body.add_paragraph()
+                para.text = f"{i}. {item}" if kind == "ol" else item
+                para.level = 1 if kind in ("ul", "ol") else 0
+                if kind == "h":
+                    para.runs[0].font.bold = True
+                paragraphs += 1
+
+    if file_stream is None:
+        file_stream = BytesIO()
     prs.save(file_stream)
     file_stream.seek(0)
     return file_stream
@@ -0,0 +1,200 @@
+# backend/app/resilience.py
+#
+# Building blocks for calling a flaky, rate-limited upstream (Gemini):
+# token buckets, jittered exponential backoff, Retry-After parsing and a
+# circuit breaker. They only report what to do (how long to wait, whether
+# a call may go out); llm.py decides which errors to raise.
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+# ---------------------------------------------------
+# TOKEN BUCKETS
+# ---------------------------------------------------
+class TokenBucket:
+    """
+    `rate` tokens per second, up to `burst` saved up. A reservation may
+    take the balance below zero; the caller then waits for it to refill.
+    A rate of 0 or less means unlimited.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> tuple[bool, float]:
+        """
+        Take one token. Returns (True, seconds to wait before using it), or
+        (False, seconds until one would be available) when that is longer
+        than `max_wait`, in which case nothing is taken.
+        """
+        if self.rate <= 0:
+            return True, 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return False, wait
+            self._tokens -= 1
+            return True, wait
+
+    def refund(self) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def is_full(self) -> bool:
+        """True once the bucket has refilled, i.e. it is the same as a new one."""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            return self._tokens + (time.monotonic() - self._updated) * self.rate >= self.burst
+
+
+class RateLimiter:
+    """A global bucket shared by everyone, plus one bucket per user."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        user_rate: float,
+        user_burst: float,
+        max_users: int = 10000,
+    ):
+        self.bucket = TokenBucket(rate, burst)
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self._users: OrderedDict = OrderedDict()  # user_id -> TokenBucket, least recently used first
+        self._lock = threading.Lock()
+
+    def user_bucket(self, user_id) -> TokenBucket:
+        with self._lock:
+            bucket = self._users.get(user_id)
+            if bucket is not None:
+                self._users.move_to_end(user_id)
+                return bucket
+
+            bucket = TokenBucket(self.user_rate, self.user_burst)
+            self._users[user_id] = bucket
+            if len(self._users) > self.max_users:
+                self._prune()
+            return bucket
+
+    def _prune(self) -> None:
+        # Only a full bucket can be dropped: one still in debt would come
+        # back full and let its user burst again. If every bucket is busy,
+        # the least recently used one goes anyway to keep memory bounded.
+        for user_id, bucket in list(self._users.items())[:-1]:
+            if bucket.is_full():
+                del self._users[user_id]
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+    def reserve(self, user_id, max_wait: float, user_max_wait: float) -> tuple[str | None, float]:
+        """
+        Returns (None, seconds to wait) when the call may go out, or
+        (scope, retry_after) with scope "user" or "global" when waiting
+        would take longer than allowed.
+        """
+        user_bucket = self.user_bucket(user_id) if user_id is not None else None
+        user_wait = 0.0
+        if user_bucket is not None:
+            granted, user_wait = user_bucket.reserve(user_max_wait)
+            if not granted:
+                return "user", user_wait
+
+        granted, wait = self.bucket.reserve(max_wait)
+        if not granted:
+            if user_bucket is not None:
+                user_bucket.refund()
+            return "global", wait
+
+        return None, max(wait, user_wait)
+
+
+# ---------------------------------------------------
+# BACKOFF
+# ---------------------------------------------------
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """'Full jitter' exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds from a Retry-After header (delta-seconds or an HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# ---------------------------------------------------
+# CIRCUIT BREAKER
+# ---------------------------------------------------
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and then rejects
+    calls for `reset_seconds`. After that one trial call is let through
+    per `reset_seconds` (half-open); a success closes the circuit again,
+    a failure keeps it open.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> float:
+        """0 if a call may go out now, otherwise seconds until the next trial call."""
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_seconds:
+                return self.reset_seconds - elapsed
+            # Half-open: this caller is the trial; the next one waits a full period
+            self.opened_at = time.monotonic()
+            return 0.0
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
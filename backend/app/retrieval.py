@@ -0,0 +1,276 @@
+# backend/app/retrieval.py
+#
+# Local TF-IDF retrieval over a project's sections, used to give the LLM
+# the most relevant passages from sibling sections (so generated sections
+# build on each other instead of repeating each other). Runs fully
+# offline: one in-process index per project, scored with NumPy.
+#
+# Indexes are synced against the sections' current content whenever they
+# are used; only sections whose text changed are re-tokenized, so the
+# index stays correct across uvicorn workers without any invalidation.
+import hashlib
+import math
+import re
+import threading
+from collections import Counter
+from typing import Iterable, NamedTuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .cache import TTLCache
+from .config import settings
+from .llm import estimate_tokens
+from . import models
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the
+this to was were will with which can also these those their they them than
+not but such into more most other been being may should would could our we
+you your about each using used use how what when where who why all any
+""".split())
+
+PASSAGE_MAX_CHARS = 1200
+
+
+class Passage(NamedTuple):
+    section_id: int
+    title: str
+    text: str
+    terms: np.ndarray    # vocabulary ids (unique)
+    weights: np.ndarray  # sublinear term frequency, 1 + log(count)
+
+
+def tokenize(text: str) -> list[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+def split_passages(content: str) -> list[str]:
+    """Paragraphs, with very long ones cut at sentence boundaries."""
+    passages = []
+    for paragraph in re.split(r"\n\s*\n", content):
+        paragraph = paragraph.strip()
+        while len(paragraph) > PASSAGE_MAX_CHARS:
+            cut = paragraph.rfind(". ", 0, PASSAGE_MAX_CHARS)
+            cut = cut + 1 if cut > 0 else PASSAGE_MAX_CHARS
+            passages.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if paragraph:
+            passages.append(paragraph)
+    return passages
+
+
+def _digest(title: str, content: str | None) -> str:
+    return hashlib.sha1(f"{title}\0{content or ''}".encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------
+# PER-PROJECT INDEX
+# ---------------------------------------------------
+class ProjectIndex:
+    def __init__(self):
+        self.vocab: dict[str, int] = {}
+        self._df = np.zeros(256, dtype=np.float32)  # document (passage) frequency per term
+        self._sections: dict[int, tuple[str, list[Passage]]] = {}  # id -> (digest, passages)
+        self._arrays = None  # cached concatenation of every passage, see _matrix()
+        self._lock = threading.Lock()
+
+    def _term_id(self, term: str) -> int:
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            term_id = self.vocab[term] = len(self.vocab)
+            if term_id >= len(self._df):
+                self._df = np.concatenate([self._df, np.zeros_like(self._df)])
+        return term_id
+
+    def _passage(self, section_id: int, title: str, text: str) -> Passage | None:
+        counts = Counter(tokenize(text))
+        if not counts:
+            return None
+        terms = np.fromiter((self._term_id(t) for t in counts), dtype=np.int32, count=len(counts))
+        weights = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        return Passage(section_id, title, text, terms, weights)
+
+    def _remove(self, section_id: int) -> None:
+        _, passages = self._sections.pop(section_id, (None, []))
+        for passage in passages:
+            self._df[passage.terms] -= 1
+
+    def _add(self, section_id: int, title: str, content: str | None) -> None:
+        passages = [
+            p for p in (self._passage(section_id, title, text) for text in split_passages(content or ""))
+            if p is not None
+        ]
+        for passage in passages:
+            self._df[passage.terms] += 1
+        self._sections[section_id] = (_digest(title, content), passages)
+
+    def sync(self, sections: Iterable[tuple[int, str, str | None]]) -> int:
+        """
+        Match the index to the given (section_id, title, content) rows.
+        Unchanged sections are skipped, changed ones re-indexed and missing
+        ones dropped. Returns how many sections were (re)indexed.
+        """
+        sections = list(sections)
+        changed = 0
+        with self._lock:
+            for section_id in set(self._sections) - {row[0] for row in sections}:
+                self._remove(section_id)
+                self._arrays = None
+
+            for section_id, title, content in sections:
+                known = self._sections.get(section_id)
+                if known is not None and known[0] == _digest(title, content):
+                    continue
+                self._remove(section_id)
+                self._add(section_id, title, content)
+                self._arrays = None
+                changed += 1
+        return changed
+
+    def _matrix(self):
+        # Sparse passage x term matrix as flat (row, column, weight) arrays
+        if self._arrays is None:
+            passages = [p for _, ps in self._sections.values() for p in ps]
+            if passages:
+                rows = np.repeat(
+                    np.arange(len(passages), dtype=np.int32), [len(p.terms) for p in passages]
+                )
+                cols = np.concatenate([p.terms for p in passages])
+                tf = np.concatenate([p.weights for p in passages])
+            else:
+                rows = cols = np.zeros(0, dtype=np.int32)
+                tf = np.zeros(0, dtype=np.float32)
+            self._arrays = (passages, rows, cols, tf)
+        return self._arrays
+
+    def query(
+        self,
+        text: str,
+        exclude_section_id: int | None = None,
+        token_budget: int | None = None,
+        max_passages: int | None = None,
+        min_score: float | None = None,
+    ) -> list[Passage]:
+        """Most similar passages (cosine over TF-IDF) that fit in `token_budget`."""
+        token_budget = settings.RETRIEVAL_TOKEN_BUDGET if token_budget is None else token_budget
+        max_passages = settings.RETRIEVAL_MAX_PASSAGES if max_passages is None else max_passages
+        min_score = settings.RETRIEVAL_MIN_SCORE if min_score is None else min_score
+
+        with self._lock:
+            passages, rows, cols, tf = self._matrix()
+            if not passages:
+                return []
+
+            counts = Counter(t for t in tokenize(text) if t in self.vocab)
+            if not counts:
+                return []
+
+            vocab_size = len(self.vocab)
+            idf = np.log((1 + len(passages)) / (1 + self._df[:vocab_size])) + 1
+
+            q = np.zeros(vocab_size, dtype=np.float32)
+            for term, count in counts.items():
+                term_id = self.vocab[term]
+                q[term_id] = (1 + math.log(count)) * idf[term_id]
+
+            weights = tf * idf[cols]
+            norms = np.sqrt(np.bincount(rows, weights * weights, minlength=len(passages)))
+            dots = np.bincount(rows, weights * q[cols], minlength=len(passages))
+            scores = dots / (norms * np.linalg.norm(q) + 1e-9)
+
+        picked, used = [], 0
+        for i in np.argsort(-scores, kind="stable"):
+            if scores[i] < min_score or len(picked) >= max_passages:
+                break
+            passage = passages[i]
+            if passage.section_id == exclude_section_id:
+                continue
+            cost = estimate_tokens(passage.text)
+            if used + cost > token_budget:
+                continue
+            picked.append(passage)
+            used += cost
+        return picked
+
+
+indexes = TTLCache(maxsize=settings.RETRIEVAL_INDEX_PROJECTS)
+
+
+def get_index(project_id: int) -> ProjectIndex:
+    index = indexes.get(project_id)
+    if index is None:
+        index = ProjectIndex()
+        indexes.set(project_id, index)
+    return index
+
+
+# ---------------------------------------------------
+# PROMPT CONTEXT
+# ---------------------------------------------------
+def format_context(passages: list[Passage]) -> str | None:
+    if not passages:
+        return None
+    return "\n\n".join(f"[{p.title}]\n{p.text}" for p in passages)
+
+
+def build_contexts(
+    project_id: int,
+    sections: Iterable[tuple[int, str, str | None]],
+    queries: list[tuple[int, str]],
+) -> list[str | None]:
+    """
+    Sync the project's index with `sections` (id, title, content) and return
+    one context block per (section_id, query text), built from the other
+    sections' passages. None where nothing relevant was found.
+    """
+    if not settings.RETRIEVAL_ENABLED:
+        return [None] * len(queries)
+
+    index = get_index(project_id)
+    index.sync(sections)
+    return [
+        format_context(index.query(text, exclude_section_id=section_id))
+        for section_id, text in queries
+    ]
+
+
+def generation_contexts(project_id: int, sections: list, topic: str) -> list[str | None]:
+    """Contexts for (re)generating each of a project's loaded sections."""
+    return build_contexts(
+        project_id,
+        [(sec.id, sec.title, sec.content) for sec in sections],
+        [(sec.id, f"{sec.title} {topic}") for sec in sections],
+    )
+
+
+def sibling_sections(db: Session, project_id: int) -> list[tuple[int, str, str | None]]:
+    return db.query(models.Section.id, models.Section.title, models.Section.content).filter(
+        models.Section.project_id == project_id
+    ).all()
+
+
+# Tokenizing, (re)building the NumPy index and waiting on its lock is CPU
+# work (a cold 100-section project takes over 100 ms), so the async routes
+# run it in the threadpool instead of on the event loop. `sections` /
+# `section` must already be loaded.
+async def agenerate_contexts(project_id: int, sections: list, topic: str) -> list[str | None]:
+    return await run_in_threadpool(generation_contexts, project_id, sections, topic)
+
+
+async def arefine_context(db, section, instruction: str) -> str | None:
+    """Context for refining one section, from its siblings' current content."""
+    if not settings.RETRIEVAL_ENABLED:
+        return None
+
+    siblings = await db.run_sync(sibling_sections, section.project_id)
+    contexts = await run_in_threadpool(
+        build_contexts,
+        section.project_id,
+        siblings,
+        [(section.id, f"{instruction} {section.title} {section.content or ''}")],
+    )
+    return contexts[0]
@@ -59,9 +59,82 @@ class ProjectOut(BaseModel):
 # ----- Refinement -----
 class RefinementRequest(BaseModel):
     prompt: str
+    fresh: bool = False  # skip the LLM response cache
 
 class FeedbackRequest(BaseModel):
     liked: bool
 
 class CommentRequest(BaseModel):
     text: str
+
+class HistoryOut(BaseModel):
+    id: int
+    revision: Optional[int]
+    prompt: Optional[str]
+    old_content: Optional[str]
+    new_content: Optional[str]
+    liked: Optional[bool]
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class RevisionDiff(BaseModel):
+    from_revision: int
+    to_revision: int
+    diff: str
+
+class CommentOut(BaseModel):
+    id: int
+    text: str
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+# ----- Pagination -----
+class HistoryPage(BaseModel):
+    items: List[HistoryOut]
+    next_cursor: Optional[str]
+
+class CommentPage(BaseModel):
+    items: List[CommentOut]
+    next_cursor: Optional[str]
+
+# ----- Search -----
+class SearchHit(BaseModel):
+    kind: str  # "project" or "section"
+    project_id: int
+    section_id: Optional[int]
+    title: str
+    snippet: str
+    score: float
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str]
+
+# ----- Jobs -----
+class JobItemOut(BaseModel):
+    section_id: int
+    title: Optional[str]
+    status: str
+    error: Optional[str]
+    content: Optional[str]
+
+    class Config:
+        orm_mode = True
+
+class JobOut(BaseModel):
+    id: int
+    project_id: int
+    status: str
+    total: int
+    completed: int
+    failed: int
+    created_at: datetime
+    finished_at: Optional[datetime]
+    items: List[JobItemOut]
+
+    class Config:
+        orm_mode = True
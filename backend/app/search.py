@@ -0,0 +1,232 @@
+# backend/app/search.py
+#
+# Full-text search over a user's project titles/topics and section
+# titles/content.
+#
+#   SQLite: FTS5 external-content tables (projects_fts, sections_fts) that
+#           triggers keep in sync on every insert/update/delete, so create,
+#           generate and refine are indexed as they commit.
+#   MySQL:  InnoDB FULLTEXT indexes, which MySQL maintains itself.
+#
+# Both are created by migration 0004. Results from both tables are merged
+# into one ranking (best first) and paged with an offset cursor.
+import re
+from functools import partial
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+SNIPPET_WORDS = 24
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+# ---------------------------------------------------
+# SCHEMA (used by the migration)
+# ---------------------------------------------------
+SQLITE_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5("
+    " title, topic, content='projects', content_rowid='id')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS sections_fts USING fts5("
+    " title, content, content='sections', content_rowid='id')",
+
+    "CREATE TRIGGER IF NOT EXISTS projects_fts_ai AFTER INSERT ON projects BEGIN"
+    " INSERT INTO projects_fts(rowid, title, topic) VALUES (new.id, new.title, new.topic);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS projects_fts_ad AFTER DELETE ON projects BEGIN"
+    " INSERT INTO projects_fts(projects_fts, rowid, title, topic) VALUES ('delete', old.id, old.title, old.topic);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS projects_fts_au AFTER UPDATE OF title, topic ON projects BEGIN"
+    " INSERT INTO projects_fts(projects_fts, rowid, title, topic) VALUES ('delete', old.id, old.title, old.topic);"
+    " INSERT INTO projects_fts(rowid, title, topic) VALUES (new.id, new.title, new.topic);"
+    " END",
+
+    "CREATE TRIGGER IF NOT EXISTS sections_fts_ai AFTER INSERT ON sections BEGIN"
+    " INSERT INTO sections_fts(rowid, title, content) VALUES (new.id, new.title, new.content);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS sections_fts_ad AFTER DELETE ON sections BEGIN"
+    " INSERT INTO sections_fts(sections_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS sections_fts_au AFTER UPDATE OF title, content ON sections BEGIN"
+    " INSERT INTO sections_fts(sections_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);"
+    " INSERT INTO sections_fts(rowid, title, content) VALUES (new.id, new.title, new.content);"
+    " END",
+
+    # Index whatever existed before the tables did
+    "INSERT INTO projects_fts(projects_fts) VALUES ('rebuild')",
+    "INSERT INTO sections_fts(sections_fts) VALUES ('rebuild')",
+]
+
+MYSQL_INDEXES = {
+    "ft_projects_title_topic": ("projects", "title, topic"),
+    "ft_sections_title_content": ("sections", "title, content"),
+}
+
+
+# ---------------------------------------------------
+# QUERY BUILDING
+# ---------------------------------------------------
+def query_terms(q: str) -> list[str]:
+    return _WORD.findall(q.lower())[:16]
+
+
+def _fts5_query(terms: list[str]) -> str:
+    # Every term must match; the last one is a prefix (search-as-you-type).
+    # Quoting keeps user input from being read as FTS5 syntax.
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _boolean_query(terms: list[str]) -> str:
+    return " ".join(f"+{term}" for term in terms[:-1]) + f" +{terms[-1]}*"
+
+
+# Rank first, snippet later: snippet() is costly and only the page needs it.
+# CROSS JOIN keeps SQLite driving from the FTS match instead of scanning
+# all of the owner's rows and probing the index for each.
+_SQLITE_SEARCH = """
+SELECT * FROM (
+    SELECT 'project' AS kind, p.id AS project_id, NULL AS section_id, p.title AS title,
+           bm25(projects_fts, 2.0, 1.0) AS score
+    FROM projects_fts
+    CROSS JOIN projects p ON p.id = projects_fts.rowid
+    WHERE projects_fts MATCH :match AND p.owner_id = :owner_id AND p.deleted_at IS NULL
+
+    UNION ALL
+
+    SELECT 'section', s.project_id, s.id, s.title, bm25(sections_fts, 2.0, 1.0)
+    FROM sections_fts
+    CROSS JOIN sections s ON s.id = sections_fts.rowid
+    CROSS JOIN projects p ON p.id = s.project_id
+    WHERE sections_fts MATCH :match AND p.owner_id = :owner_id AND p.deleted_at IS NULL
+)
+ORDER BY score, kind, section_id, project_id
+LIMIT :limit OFFSET :offset
+"""
+
+_SQLITE_SNIPPETS = {
+    # kind -> (fts table, column searched for the snippet)
+    "project": ("projects_fts", 1),
+    "section": ("sections_fts", 1),
+}
+
+
+def _sqlite_snippets(db: Session, match: str, kind: str, ids: list[int]) -> dict[int, str]:
+    if not ids:
+        return {}
+
+    table, column = _SQLITE_SNIPPETS[kind]
+    query = text(
+        f"SELECT rowid, snippet({table}, {column}, '[', ']', '…', :words) FROM {table}"
+        f" WHERE {table} MATCH :match AND rowid IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+
+    rows = db.execute(query, {"match": match, "ids": ids, "words": SNIPPET_WORDS // 2})
+    return {row_id: snippet or "" for row_id, snippet in rows}
+
+
+# bm25() is lower-is-better; MATCH ... AGAINST is higher-is-better.
+# Bodies are fetched for the page only, once it is known.
+_MYSQL_SEARCH = """
+SELECT * FROM (
+    SELECT 'project' AS kind, p.id AS project_id, NULL AS section_id, p.title AS title,
+           MATCH(p.title, p.topic) AGAINST (:match IN BOOLEAN MODE) AS score
+    FROM projects p
+    WHERE MATCH(p.title, p.topic) AGAINST (:match IN BOOLEAN MODE)
+      AND p.owner_id = :owner_id AND p.deleted_at IS NULL
+
+    UNION ALL
+
+    SELECT 'section', s.project_id, s.id, s.title,
+           MATCH(s.title, s.content) AGAINST (:match IN BOOLEAN MODE)
+    FROM sections s
+    JOIN projects p ON p.id = s.project_id
+    WHERE MATCH(s.title, s.content) AGAINST (:match IN BOOLEAN MODE)
+      AND p.owner_id = :owner_id AND p.deleted_at IS NULL
+) hits
+ORDER BY score DESC, kind, section_id, project_id
+LIMIT :limit OFFSET :offset
+"""
+
+
+_MYSQL_BODIES = {
+    "project": "SELECT id, topic FROM projects WHERE id IN :ids",
+    "section": "SELECT id, content FROM sections WHERE id IN :ids",
+}
+
+
+def _mysql_snippets(db: Session, terms: list[str], kind: str, ids: list[int]) -> dict[int, str]:
+    if not ids:
+        return {}
+
+    query = text(_MYSQL_BODIES[kind]).bindparams(bindparam("ids", expanding=True))
+    return {row_id: make_snippet(body, terms) for row_id, body in db.execute(query, {"ids": ids})}
+
+
+def make_snippet(body: str | None, terms: list[str], words: int = SNIPPET_WORDS) -> str:
+    """Window of `words` words around the first term hit, hits wrapped in [ ]."""
+    tokens = (body or "").split()
+    if not tokens:
+        return ""
+
+    def is_hit(token: str) -> bool:
+        token = token.lower()
+        return any(token.startswith(term) or term in token for term in terms)
+
+    first = next((i for i, token in enumerate(tokens) if is_hit(token)), 0)
+    start = max(0, first - words // 3)
+    window = tokens[start:start + words]
+
+    snippet = " ".join(f"[{t}]" if is_hit(t) else t for t in window)
+    if start > 0:
+        snippet = "…" + snippet
+    if start + words < len(tokens):
+        snippet += "…"
+    return snippet
+
+
+# ---------------------------------------------------
+# SEARCH
+# ---------------------------------------------------
+def search(db: Session, owner_id: int, q: str, limit: int, offset: int) -> list[dict]:
+    terms = query_terms(q)
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    params = {"owner_id": owner_id, "limit": limit, "offset": offset}
+
+    if dialect == "sqlite":
+        match = _fts5_query(terms)
+        rows = db.execute(text(_SQLITE_SEARCH), {**params, "match": match}).mappings().all()
+        snippets = partial(_sqlite_snippets, db, match)
+        sign = -1
+
+    elif dialect == "mysql":
+        rows = db.execute(text(_MYSQL_SEARCH), {**params, "match": _boolean_query(terms)}).mappings().all()
+        snippets = partial(_mysql_snippets, db, terms)
+        sign = 1
+
+    else:
+        raise HTTPException(status_code=501, detail="Search is not available on this database")
+
+    def hit_id(row) -> int:
+        return row["section_id"] if row["kind"] == "section" else row["project_id"]
+
+    page_snippets = {
+        kind: snippets(kind, [hit_id(row) for row in rows if row["kind"] == kind])
+        for kind in ("project", "section")
+    }
+
+    return [
+        {
+            "kind": row["kind"],
+            "project_id": row["project_id"],
+            "section_id": row["section_id"],
+            "title": row["title"],
+            "snippet": page_snippets[row["kind"]].get(hit_id(row), ""),
+            "score": sign * float(row["score"]),
+        }
+        for row in rows
+    ]
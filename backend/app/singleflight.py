@@ -0,0 +1,42 @@
+# backend/app/singleflight.py
+#
+# In-flight request coalescing: while a call for a key is running, further
+# calls with the same key wait for its result instead of starting their own.
+# Double-clicks and client retries on generate/refine then cost one LLM run
+# and write one history row. Coalescing is per process.
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Result of `fn()`, shared with every caller that asks for `key` while
+        it runs. Exceptions are shared the same way. The call runs as its
+        own task, so a caller that disconnects does not cancel it for the
+        others.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+
+            def forget(done, key=key):
+                # The key may already belong to a newer call
+                if self._calls.get(key) is done:
+                    del self._calls[key]
+                if not done.cancelled():
+                    done.exception()  # retrieved, even if every caller went away
+
+            task.add_done_callback(forget)
+
+        return await asyncio.shield(task)
+
+
+flights = SingleFlight()
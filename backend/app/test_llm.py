@@ -1,2 +1,3 @@
-from llm import call_llm
+# Run from backend/: python -m app.test_llm
+from app.llm import call_llm
 print(call_llm("Write a short paragraph about AI."))
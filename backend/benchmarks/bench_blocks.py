@@ -0,0 +1,115 @@
+# backend/benchmarks/bench_blocks.py
+#
+# Cost of turning LLM output into section content: the old chain of
+# str.replace passes against clean_text, the block parser that now runs when
+# content is saved, and the streaming cleaner (also per chunk). Inputs are
+# generated markdown-style answers (headings, bold, bullets, numbering).
+#
+# Run from backend/:  python -m benchmarks.bench_blocks [--paragraphs 12 --samples 2000]
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.blocks import StreamCleaner, clean_text, parse_blocks  # noqa: E402
+
+_vocab_rng = random.Random(7)
+WORDS = [
+    "".join(_vocab_rng.choice("etaoinshrdlcumwfgypbvk") for _ in range(_vocab_rng.randint(2, 10)))
+    for _ in range(2000)
+]
+WEIGHTS = [1 / rank for rank in range(1, len(WORDS) + 1)]
+
+
+def legacy_clean_output(text: str) -> str:
+    # clean_output before blocks.py, kept here for comparison
+    text = text.replace("*", "")
+    text = text.replace("###", "")
+    text = text.replace("##", "")
+    text = text.replace("#", "")
+    text = text.replace("_", "")
+    return text.strip()
+
+
+def words(rng: random.Random, count: int) -> list[str]:
+    return rng.choices(WORDS, WEIGHTS, k=count)
+
+
+def llm_answer(rng: random.Random, paragraphs: int) -> str:
+    parts = []
+    for i in range(paragraphs):
+        if i % 4 == 0:
+            parts.append("## " + " ".join(words(rng, 3)).title())
+        if i % 4 == 2:
+            marker = rng.choice(["*", "-", "1."])
+            parts.append("\n".join(f"{marker} **{w}** " + " ".join(words(rng, 8)) for w in words(rng, 4)))
+        else:
+            sentences = [" ".join(words(rng, 16)).capitalize() + "." for _ in range(5)]
+            sentences[1] = sentences[1].replace(" ", " **", 1).replace(".", "**.", 1)
+            parts.append(" ".join(sentences))
+    return "\n\n".join(parts)
+
+
+def timed(fn, inputs: list[str]) -> list[float]:
+    times = []
+    for text in inputs:
+        start = time.perf_counter()
+        fn(text)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+CHUNK = 24
+
+
+def stream_clean(text: str, chunk: int = CHUNK) -> str:
+    cleaner = StreamCleaner()
+    for i in range(0, len(text), chunk):
+        cleaner.feed(text[i:i + chunk])
+    cleaner.flush()
+    return cleaner.text
+
+
+def report(name: str, times: list[float], baseline: float | None = None) -> None:
+    times = sorted(times)
+    p50 = statistics.median(times)
+    p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+    ratio = f"  ({p50 / baseline:4.1f}x legacy)" if baseline else ""
+    print(f"{name:<30} p50 {p50 * 1e6:8.1f} us   p95 {p95 * 1e6:8.1f} us{ratio}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paragraphs", type=int, default=12)
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    inputs = [llm_answer(rng, args.paragraphs) for _ in range(args.samples)]
+    cleaned = [clean_text(text) for text in inputs]
+    print(f"{args.samples} answers, {statistics.mean(len(t) for t in inputs):.0f} chars on average")
+
+    legacy = timed(legacy_clean_output, inputs)
+    baseline = statistics.median(legacy)
+    report("legacy clean_output", legacy)
+    report("clean_text", timed(clean_text, inputs), baseline)
+    streamed = timed(stream_clean, inputs)
+    report(f"StreamCleaner, {CHUNK}-char chunks", streamed, baseline)
+    chunks = statistics.mean(-(-len(text) // CHUNK) for text in inputs)
+    print(f"{'  per chunk':<30} p50 {statistics.median(streamed) / chunks * 1e6:8.2f} us")
+    report("parse_blocks (at save time)", timed(parse_blocks, cleaned), baseline)
+    report("clean + parse", timed(lambda t: parse_blocks(clean_text(t)), inputs), baseline)
+
+    blocks = [parse_blocks(text) for text in cleaned]
+    kinds = {}
+    for section in blocks:
+        for kind, _ in section:
+            kinds[kind] = kinds.get(kind, 0) + 1
+    print("blocks per answer:", ", ".join(f"{k} {v / len(blocks):.1f}" for k, v in sorted(kinds.items())))
+
+
+if __name__ == "__main__":
+    main()
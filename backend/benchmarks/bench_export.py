@@ -0,0 +1,97 @@
+# backend/benchmarks/bench_export.py
+#
+# Peak RSS and latency of DOCX/PPTX export vs. section count, comparing the
+# old in-memory BytesIO build with the spooled export pipeline.
+#
+# Run from backend/:  python -m benchmarks.bench_export [--sizes 10,50,100,200]
+#
+# Every (mode, size) runs in a fresh subprocess so ru_maxrss is the peak of
+# that run alone.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+PARAGRAPH = (
+    "Artificial intelligence systems are increasingly used to draft, review "
+    "and summarise long technical documents for students and professionals. "
+) * 12
+
+
+def make_project(sections: int, doc_type: str):
+    from app.export_pipeline import ExportProject, ExportSection
+
+    return ExportProject(
+        title="Benchmark",
+        topic="Export pipeline benchmark",
+        doc_type=doc_type,
+        sections=tuple(
+            ExportSection(title=f"Section {i}", order=i, content="\n\n".join([PARAGRAPH] * 4))
+            for i in range(sections)
+        ),
+    )
+
+
+def run_once(mode: str, doc_type: str, sections: int) -> dict:
+    from app import export_pipeline
+    from app.config import settings
+
+    project = make_project(sections, doc_type)
+
+    start = time.perf_counter()
+    if mode == "bytesio":
+        data = export_pipeline.BUILDERS[doc_type](project).getvalue()
+        size = len(data)
+    else:
+        spool = export_pipeline.render_to_spool(doc_type, project, settings.EXPORT_SPOOL_MAX_BYTES)
+        size = sum(len(chunk) for chunk in export_pipeline.iter_file(spool))
+    elapsed = time.perf_counter() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_kb //= 1024
+
+    return {
+        "mode": mode,
+        "doc_type": doc_type,
+        "sections": sections,
+        "seconds": round(elapsed, 4),
+        "bytes": size,
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,50,100,200")
+    parser.add_argument("--doc-types", default="docx,pptx")
+    parser.add_argument("--single", nargs=3, metavar=("MODE", "DOC_TYPE", "SECTIONS"))
+    args = parser.parse_args()
+
+    if args.single:
+        mode, doc_type, sections = args.single
+        print(json.dumps(run_once(mode, doc_type, int(sections))))
+        return
+
+    print(f"{'doc':<5} {'mode':<8} {'sections':>8} {'seconds':>8} {'size KB':>8} {'peak MB':>8}")
+    for doc_type in args.doc_types.split(","):
+        for sections in [int(n) for n in args.sizes.split(",")]:
+            for mode in ("bytesio", "spooled"):
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_export", "--single", mode, doc_type, str(sections)],
+                    capture_output=True, text=True, check=True,
+                )
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                print(
+                    f"{doc_type:<5} {mode:<8} {sections:>8} {r['seconds']:>8} "
+                    f"{r['bytes'] // 1024:>8} {r['peak_rss_mb']:>8}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# backend/benchmarks/bench_login.py
+#
+# Login throughput under load, and what that load does to the p99 of an
+# unrelated route (GET /projects, a sync route on the shared threadpool).
+#
+# Starts uvicorn on a throwaway SQLite database, so nothing external is
+# needed. Run from backend/:
+#
+#   python -m benchmarks.bench_login [--concurrency 32] [--seconds 10]
+#
+# Compare settings by exporting them first, e.g.
+#   PASSWORD_HASH_EXECUTOR=process PASSWORD_HASH_WORKERS=4 python -m benchmarks.bench_login
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def wait_until_up(base: str) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                await client.get(base + "/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def run(base: str, concurrency: int, seconds: float) -> None:
+    credentials = {"username": "bench@example.com", "password": "bench-password"}
+
+    async with httpx.AsyncClient(base_url=base, timeout=60) as client:
+        await client.post("/auth/register", json={"email": credentials["username"], "password": credentials["password"]})
+        token = (await client.post("/auth/login", data=credentials)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # Baseline latency of the unrelated route with no login load
+        baseline = []
+        for _ in range(200):
+            start = time.perf_counter()
+            await client.get("/projects", headers=headers)
+            baseline.append(time.perf_counter() - start)
+
+        deadline = time.perf_counter() + seconds
+        logins = 0
+        probe = []
+
+        async def login_loop():
+            nonlocal logins
+            while time.perf_counter() < deadline:
+                res = await client.post("/auth/login", data=credentials)
+                res.raise_for_status()
+                logins += 1
+
+        async def probe_loop():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await client.get("/projects", headers=headers)
+                probe.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        started = time.perf_counter()
+        await asyncio.gather(probe_loop(), *(login_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    print(f"logins/sec                 {logins / elapsed:8.1f}")
+    print(f"GET /projects p50 idle     {statistics.median(baseline) * 1000:8.1f} ms")
+    print(f"GET /projects p99 idle     {percentile(baseline, 99) * 1000:8.1f} ms")
+    print(f"GET /projects p50 loaded   {statistics.median(probe) * 1000:8.1f} ms")
+    print(f"GET /projects p99 loaded   {percentile(probe, 99) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    port = free_port()
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        asyncio.run(wait_until_up(base))
+        asyncio.run(run(base, args.concurrency, args.seconds))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
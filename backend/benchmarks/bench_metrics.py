@@ -0,0 +1,106 @@
+# backend/benchmarks/bench_metrics.py
+#
+# Cost of the /metrics instrumentation: recording primitives on their own,
+# then the same work with METRICS_ENABLED on and off, for SQL statements
+# (engine event listeners) and for requests through the full ASGI stack
+# (middleware). Rounds alternate between on and off so drift hits both.
+#
+# Run from backend/:  python -m benchmarks.bench_metrics [--requests 2000 --queries 20000]
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'metrics.db')}")
+
+import httpx  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from app import metrics  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+ROUNDS = 5
+
+
+def per_op(fn, count: int) -> float:
+    start = time.perf_counter()
+    fn(count)
+    return (time.perf_counter() - start) / count
+
+
+def primitives(count: int) -> None:
+    counter = metrics.Counter("bench_total", "bench", ("operation",))
+    histogram = metrics.Histogram("bench_seconds", "bench", ("operation",))
+    child = histogram.labels("generate")
+
+    def inc(n):
+        for _ in range(n):
+            counter.labels("generate").inc()
+
+    def observe(n):
+        for i in range(n):
+            histogram.labels("generate").observe(i * 1e-5)
+
+    def observe_child(n):
+        for i in range(n):
+            child.observe(i * 1e-5)
+
+    for name, fn in (("counter.labels().inc()", inc), ("histogram.labels().observe()", observe),
+                     ("histogram child .observe()", observe_child)):
+        print(f"{name:<34} {per_op(fn, count) * 1e9:8.0f} ns")
+
+
+def compare(name: str, run, count: int) -> None:
+    """Median per-op time with metrics on and off, over alternating rounds."""
+    times = {True: [], False: []}
+    run(max(1, count // 10))  # warm up
+    for _ in range(ROUNDS):
+        for enabled in (True, False):
+            settings.METRICS_ENABLED = enabled
+            times[enabled].append(per_op(run, count))
+    settings.METRICS_ENABLED = True
+
+    on, off = statistics.median(times[True]), statistics.median(times[False])
+    print(
+        f"{name:<34} off {off * 1e6:8.1f} us   on {on * 1e6:8.1f} us   "
+        f"overhead {(on - off) * 1e6:+6.1f} us ({(on - off) / off:+.1%})"
+    )
+
+
+def sql_queries(n: int) -> None:
+    with engine.connect() as conn:
+        for _ in range(n):
+            conn.execute(text("SELECT 1")).scalar()
+
+
+async def requests(n: int, path: str) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(n):
+            await client.get(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--primitives", type=int, default=200000)
+    args = parser.parse_args()
+
+    primitives(args.primitives)
+    compare("SQL statement (SELECT 1)", sql_queries, args.queries)
+    compare("GET / (no DB)", lambda n: asyncio.run(requests(n, "/")), args.requests)
+    compare("GET /sections/1/comments (401)", lambda n: asyncio.run(requests(n, "/sections/1/comments")), args.requests)
+    compare("GET /unknown (404, all routes tried)", lambda n: asyncio.run(requests(n, "/unknown")), args.requests)
+
+    start = time.perf_counter()
+    body = metrics.render()
+    print(f"render /metrics: {len(body.splitlines())} lines in {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
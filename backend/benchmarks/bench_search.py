@@ -0,0 +1,132 @@
+# backend/benchmarks/bench_search.py
+#
+# Latency of GET /search's query (app.search.search) on a SQLite FTS5 index
+# over a generated corpus, plus the cost the triggers add to each write.
+# The corpus is split across --users owners; queries run as one of them.
+#
+# Run from backend/:  python -m benchmarks.bench_search [--sections 100000 --users 10]
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "search.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import insert, update  # noqa: E402
+
+from app import migrations, models, search  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+
+# Zipf-distributed made-up vocabulary, plus a few real words to search for
+_vocab_rng = random.Random(7)
+WORDS = [
+    "".join(_vocab_rng.choice("etaoinshrdlcumwfgypbvk") for _ in range(_vocab_rng.randint(3, 10)))
+    for _ in range(5000)
+]
+WEIGHTS = [1 / rank for rank in range(1, len(WORDS) + 1)]
+
+QUERIES = {
+    "common word": lambda: WORDS[0],
+    "mid word": lambda: WORDS[200],
+    "rare word": lambda: WORDS[4000],
+    "two words": lambda: f"{WORDS[5]} {WORDS[60]}",
+    "prefix": lambda: WORDS[30][:3],
+}
+
+SECTIONS_PER_PROJECT = 10
+
+
+def paragraph(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(WORDS, WEIGHTS, k=words))
+
+
+def build_corpus(sections: int, users: int, rng: random.Random) -> None:
+    Base.metadata.create_all(bind=engine)
+    migrations.run_migrations(engine)
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": u + 1, "email": f"user{u}@example.com", "hashed_password": "x"} for u in range(users)
+        ])
+
+        projects = sections // SECTIONS_PER_PROJECT
+        conn.execute(insert(models.Project), [
+            {
+                "id": p + 1,
+                "title": paragraph(rng, 4),
+                "topic": paragraph(rng, 12),
+                "doc_type": "docx",
+                "owner_id": p % users + 1,
+            }
+            for p in range(projects)
+        ])
+
+        batch = []
+        for s in range(sections):
+            batch.append({
+                "title": paragraph(rng, 4),
+                "order": s % SECTIONS_PER_PROJECT,
+                "content": paragraph(rng, 150),
+                "project_id": s // SECTIONS_PER_PROJECT + 1,
+            })
+            if len(batch) == 5000:
+                conn.execute(insert(models.Section), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(models.Section), batch)
+
+
+def timed(fn, samples: int) -> list[float]:
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def report(name: str, times: list[float]) -> None:
+    times = sorted(times)
+    p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+    print(f"{name:<28} p50 {statistics.median(times) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sections", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+
+    start = time.perf_counter()
+    build_corpus(args.sections, args.users, rng)
+    build = time.perf_counter() - start
+    print(f"{args.sections} sections across {args.users} users, built + indexed in {build:.1f}s "
+          f"({os.path.getsize(DB_PATH) / 2**20:.0f} MiB)")
+
+    db = SessionLocal()
+    for name, make_query in QUERIES.items():
+        q = make_query()
+        hits = len(search.search(db, 1, q, 1000, 0))
+        report(f"{name} page 1 ({hits}+ hits)", timed(lambda: search.search(db, 1, q, 20, 0), args.samples))
+        report(f"{name} page 10", timed(lambda: search.search(db, 1, q, 20, 180), args.samples))
+
+    # Incremental indexing: what the triggers add to refine/generate's UPDATE
+    def refine_one():
+        section_id = rng.randint(1, args.sections)
+        db.execute(
+            update(models.Section).where(models.Section.id == section_id).values(content=paragraph(rng, 150))
+        )
+        db.commit()
+
+    report("update 1 section + reindex", timed(refine_one, args.samples * 5))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
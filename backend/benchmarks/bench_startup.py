@@ -0,0 +1,140 @@
+# backend/benchmarks/bench_startup.py
+#
+# Cold-start cost, measured in fresh interpreters:
+#   - `import app.main`: time, and whether it loaded the export libraries or
+#     touched the database (both should wait for first use / the lifespan)
+#   - launching uvicorn until the first answered request, with AUTO_MIGRATE
+#     on against an empty database and off against one already migrated by
+#     `python -m app.migrations` (the fast cold-start mode)
+#
+# Fails (exit 1) if startup imports python-docx/python-pptx, if the import
+# creates the database, or if a median is over its --max-*-ms budget.
+#
+# Run from backend/:  python -m benchmarks.bench_startup [--runs 5] [--max-import-ms 1500]
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+LAZY_MODULES = ("docx", "pptx")
+
+IMPORT_SNIPPET = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def fresh_env(**overrides) -> tuple[dict, str]:
+    db_path = os.path.join(tempfile.mkdtemp(), "startup.db")
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        # Refused at once, so the Gemini warm-up never waits on the network
+        "LLM_BASE_URL": "http://127.0.0.1:9/v1",
+        **overrides,
+    })
+    return env, db_path
+
+
+# ---------------------------------------------------
+# MEASUREMENTS
+# ---------------------------------------------------
+def measure_import() -> tuple[float, list[str], bool]:
+    """(seconds, lazy modules that got loaded, whether the database file was created)."""
+    env, db_path = fresh_env()
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    return result["seconds"], result["loaded"], os.path.exists(db_path)
+
+
+def measure_startup(auto_migrate: bool) -> tuple[float, float]:
+    """(seconds to migrate beforehand, seconds from launch to the first answered request)."""
+    env, _ = fresh_env(AUTO_MIGRATE="true" if auto_migrate else "false")
+
+    migrate_seconds = 0.0
+    if not auto_migrate:
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "app.migrations"], env=env, check=True, capture_output=True)
+        migrate_seconds = time.perf_counter() - started
+
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client() as client:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                        return migrate_seconds, time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="fail above this median import time")
+    parser.add_argument("--max-startup-ms", type=float, help="fail above this median cold start (AUTO_MIGRATE off)")
+    args = parser.parse_args()
+
+    failures = []
+
+    imports = [measure_import() for _ in range(args.runs)]
+    import_ms = statistics.median(seconds for seconds, _, _ in imports) * 1000
+    loaded = sorted({m for _, modules, _ in imports for m in modules})
+    touched_db = any(created for _, _, created in imports)
+    print(f"import app.main                     {import_ms:8.1f} ms (median of {args.runs})")
+    print(f"export libraries loaded at import   {', '.join(loaded) or 'none'}")
+    print(f"database touched at import          {'yes' if touched_db else 'no'}")
+    if loaded:
+        failures.append(f"imported at startup: {', '.join(loaded)}")
+    if touched_db:
+        failures.append("the database is opened at import")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import {import_ms:.0f} ms > {args.max_import_ms:.0f} ms")
+
+    for auto_migrate in (True, False):
+        runs = [measure_startup(auto_migrate) for _ in range(args.runs)]
+        startup_ms = statistics.median(seconds for _, seconds in runs) * 1000
+        label = "on, empty database" if auto_migrate else "off, migrated"
+        line = f"first response, AUTO_MIGRATE {label:<20} {startup_ms:8.1f} ms"
+        if not auto_migrate:
+            line += f"  (python -m app.migrations beforehand: {statistics.median(m for m, _ in runs) * 1000:.0f} ms)"
+            if args.max_startup_ms is not None and startup_ms > args.max_startup_ms:
+                failures.append(f"cold start {startup_ms:.0f} ms > {args.max_startup_ms:.0f} ms")
+        print(line)
+
+    for failure in failures:
+        print("FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# backend/benchmarks/check_blocks.py
+#
+# Checks that cleaning LLM output keeps its structure: known cases parse to
+# the expected blocks, parse_blocks gives the same blocks for the raw and the
+# cleaned text, and StreamCleaner output equals clean_text whatever the chunk
+# boundaries. Exits 1 if any check fails.
+#
+# Run from backend/:  python -m benchmarks.check_blocks
+import random
+import sys
+
+from app.blocks import StreamCleaner, clean_text, parse_blocks
+from benchmarks.bench_blocks import llm_answer
+
+CASES = [
+    (
+        "heading directly followed by text",
+        "## Key Benefits\nSolar power reduces costs.\n",
+        [["h", "Key Benefits"], ["p", "Solar power reduces costs."]],
+    ),
+    (
+        "heading ending in punctuation",
+        "## Why does it matter?\nBecause it scales.",
+        [["h", "Why does it matter?"], ["p", "Because it scales."]],
+    ),
+    (
+        "short unpunctuated paragraph line",
+        "Revenue grew 12% in Q3\n\nCosts stayed flat.",
+        [["p", "Revenue grew 12% in Q3"], ["p", "Costs stayed flat."]],
+    ),
+    (
+        "bold numbering",
+        "**1.** Plan\n**2.** Build",
+        [["ol", ["Plan", "Build"]]],
+    ),
+    (
+        "lists with blank lines and mixed bullets",
+        "* **Fast:** yes\n\n- Cheap\n+ Simple\n\n1) One\n2. Two",
+        [["ul", ["Fast: yes", "Cheap", "Simple"]], ["ol", ["One", "Two"]]],
+    ),
+    (
+        "inline markup is not structure",
+        "**bold** and #hashtag\n_under_ *em*",
+        [["p", "bold and hashtag under em"]],
+    ),
+]
+
+# Characters that make up markers, markup and line structure
+FUZZ_ALPHABET = [
+    "#", "##", "*", "**", "_", "-", "+", "•", "1", ".", ")", "12", "1234",
+    " ", "  ", "\t", "\r", "\n", "\n\n", "a", "Word", "?",
+]
+
+results = []
+
+
+def check(name: str, ok: bool, detail: str = "") -> None:
+    results.append(ok)
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<48} {detail}")
+
+
+def stream_clean(text: str, rng: random.Random, max_chunk: int) -> str:
+    cleaner = StreamCleaner()
+    out = ""
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, max_chunk)
+        out += cleaner.feed(text[i:i + size])
+        i += size
+    out += cleaner.flush()
+    return out if out == cleaner.text else None
+
+
+def main() -> int:
+    for name, text, expected in CASES:
+        raw, cleaned = parse_blocks(text), parse_blocks(clean_text(text))
+        check(name, raw == expected and cleaned == expected, "" if cleaned == expected else str(cleaned))
+
+    rng = random.Random(3)
+    answers = [llm_answer(rng, 12) for _ in range(200)]
+    answers += [
+        "".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 16)))
+        for _ in range(20000)
+    ]
+
+    differ = [text for text in answers if parse_blocks(clean_text(text)) != parse_blocks(text)]
+    check("parse_blocks(clean_text(x)) == parse_blocks(x)", not differ, repr(differ[0]) if differ else "")
+
+    differ = [text for text in answers if clean_text(clean_text(text)) != clean_text(text)]
+    check("cleaning is idempotent", not differ, repr(differ[0]) if differ else "")
+
+    differ = [
+        text for text in answers
+        if stream_clean(text, rng, 1) != clean_text(text) or stream_clean(text, rng, 40) != clean_text(text)
+    ]
+    check("StreamCleaner output equals clean_text", not differ, repr(differ[0]) if differ else "")
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# backend/benchmarks/check_migrations.py
+#
+# Upgrades a database with the original (pre-migrations) schema: creates the
+# tables exactly as the first release did, fills them with projects whose
+# refinement history keeps full old/new texts, runs `migrations.migrate()`
+# and checks through the API that every revision reads back unchanged and
+# that project deletion cascades. Exits 1 if any check fails.
+#
+# Run from backend/:  python -m benchmarks.check_migrations
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "migrations.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import (  # noqa: E402
+    Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, func, select,
+)
+
+from app import auth, migrations, models  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+# ---------------------------------------------------
+# BASELINE SCHEMA (as the first release created it)
+# ---------------------------------------------------
+baseline = MetaData()
+
+users = Table(
+    "users", baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("email", String(255), unique=True, index=True, nullable=False),
+    Column("full_name", String(255), nullable=True),
+    Column("hashed_password", String(255), nullable=False),
+    Column("created_at", DateTime),
+)
+projects = Table(
+    "projects", baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String(255), nullable=False),
+    Column("topic", Text, nullable=False),
+    Column("doc_type", String(10), nullable=False),
+    Column("created_at", DateTime),
+    Column("owner_id", Integer, ForeignKey("users.id")),
+)
+sections = Table(
+    "sections", baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String(255), nullable=False),
+    Column("order", Integer, nullable=False),
+    Column("content", Text, nullable=True),
+    Column("project_id", Integer, ForeignKey("projects.id")),
+)
+refinement_history = Table(
+    "refinement_history", baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("section_id", Integer, ForeignKey("sections.id")),
+    Column("old_content", Text, nullable=True),
+    Column("new_content", Text, nullable=True),
+    Column("prompt", Text, nullable=True),
+    Column("liked", Boolean, nullable=True),
+    Column("created_at", DateTime),
+)
+comments = Table(
+    "comments", baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("section_id", Integer, ForeignKey("sections.id")),
+    Column("text", Text, nullable=False),
+    Column("created_at", DateTime),
+)
+
+EMAIL = "migrations@example.com"
+PASSWORD = "migrations"
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+results = []
+
+
+def check(name: str, ok: bool, detail: str = "") -> None:
+    results.append(ok)
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<48} {detail}")
+
+
+def seed() -> dict[int, list[tuple[str | None, str]]]:
+    """Fill the baseline tables; returns section_id -> [(old_content, new_content), ...]."""
+    rng = random.Random(1)
+    started = datetime(2024, 1, 1)
+    expected = {}
+
+    with engine.begin() as conn:
+        user_id = conn.execute(users.insert().values(
+            email=EMAIL, hashed_password=auth.get_password_hash(PASSWORD), created_at=started,
+        )).inserted_primary_key[0]
+        project_id = conn.execute(projects.insert().values(
+            title="Legacy", topic="Upgrades", doc_type="docx", owner_id=user_id, created_at=started,
+        )).inserted_primary_key[0]
+
+        for order in range(3):
+            content = "Seed text." if order == 1 else None
+            section_id = conn.execute(sections.insert().values(
+                title=f"Section {order}", order=order, content=content, project_id=project_id,
+            )).inserted_primary_key[0]
+
+            revisions = []
+            for step in range(25):
+                tokens = content.split(" ") if content else [rng.choice(WORDS) for _ in range(200)]
+                for _ in range(5):
+                    tokens[rng.randrange(len(tokens))] = rng.choice(WORDS)
+                new = " ".join(tokens) + (".\n\nNext paragraph." if step % 3 == 0 else ".")
+                # One row whose old text does not match the previous new text
+                old = "Edited by hand." if order == 2 and step == 10 else content
+
+                conn.execute(refinement_history.insert().values(
+                    section_id=section_id, old_content=old, new_content=new, prompt=f"step {step}",
+                    created_at=started + timedelta(minutes=len(revisions) + order * 100),
+                ))
+                revisions.append((old, new))
+                content = new
+
+            conn.execute(sections.update().where(sections.c.id == section_id).values(content=content))
+            conn.execute(comments.insert().values(section_id=section_id, text="keep me", created_at=started))
+            expected[section_id] = revisions
+
+    return expected
+
+
+def main() -> int:
+    baseline.create_all(bind=engine)
+    expected = seed()
+
+    applied = migrations.migrate()
+    check("migrations applied", bool(applied), ", ".join(applied))
+    check("re-running is a no-op", migrations.migrate() == [])
+
+    db = SessionLocal()
+    history = models.RefinementHistory
+    unnumbered = db.query(func.count(history.id)).filter(history.revision.is_(None)).scalar()
+    total = db.query(func.count(history.id)).scalar()
+    comment_count = db.query(func.count(models.Comment.id)).scalar()
+    db.close()
+    check("every history row kept and numbered", unnumbered == 0 and total == 75, f"{total} rows, {unnumbered} unnumbered")
+    check("comments kept", comment_count == 3, f"{comment_count} comments")
+
+    client = TestClient(app, raise_server_exceptions=False)
+    token = client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    mismatched = 0
+    for section_id, revisions in expected.items():
+        items = []
+        cursor = None
+        while True:
+            res = client.get(f"/sections/{section_id}/history", headers=headers,
+                             params={"limit": 100, **({"cursor": cursor} if cursor else {})})
+            if res.status_code != 200:
+                break
+            items += res.json()["items"]
+            cursor = res.json()["next_cursor"]
+            if not cursor:
+                break
+
+        got = sorted((item["revision"], item["old_content"], item["new_content"]) for item in items)
+        want = [(revision, old, new) for revision, (old, new) in enumerate(revisions, start=1)]
+        mismatched += got != want
+
+    check("history reads back unchanged", mismatched == 0, f"{mismatched} sections differ")
+
+    section_id, revisions = next(iter(expected.items()))
+    res = client.get(f"/sections/{section_id}/revisions/12", headers=headers)
+    check("single revision", res.status_code == 200 and res.json()["new_content"] == revisions[11][1])
+
+    res = client.get(f"/sections/{section_id}/diff", headers=headers, params={"from_revision": 0, "to_revision": 25})
+    check("diff", res.status_code == 200 and res.json()["diff"].startswith("--- revision 0"))
+
+    project_id = client.get("/projects", headers=headers).json()[0]["id"]
+    client.delete(f"/projects/{project_id}", headers=headers)
+    with engine.connect() as conn:
+        left = [
+            conn.scalar(select(func.count()).select_from(table))
+            for table in (sections, refinement_history, comments)
+        ]
+    check("deleting the project cascades", left == [0, 0, 0], f"left {left}")
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# backend/benchmarks/check_query_budget.py
+#
+# Guards against N+1 regressions: seeds a throwaway SQLite database, calls
+# the read-heavy endpoints with SQL_QUERY_COUNTER enabled and fails (exit 1)
+# if any of them runs more statements than its budget. The budgets do not
+# depend on how many projects/sections exist.
+#
+# Run from backend/:  python -m benchmarks.check_query_budget
+import os
+import sys
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "budget.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["SQL_QUERY_COUNTER"] = "true"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import migrations  # noqa: E402
+from app.main import app  # noqa: E402
+
+PROJECTS = 25
+SECTIONS = 8
+
+# endpoint -> max SQL statements (auth lookup included)
+BUDGETS = {
+    "GET /projects": 3,
+    "GET /projects/{id}": 3,
+    "GET /projects/{id}/export/docx": 3,
+    "GET /jobs/{id}": 3,
+    "GET /sections/{id}/history": 3,
+    "GET /sections/{id}/comments": 3,
+    "DELETE /projects/{id}": 2,  # the database cascades, however big the project
+}
+
+
+def main() -> int:
+    migrations.migrate()
+    client = TestClient(app)
+    client.post("/auth/register", json={"email": "budget@example.com", "password": "budget"})
+    token = client.post(
+        "/auth/login", data={"username": "budget@example.com", "password": "budget"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    project = None
+    for p in range(PROJECTS):
+        project = client.post("/projects", headers=headers, json={
+            "title": f"Project {p}",
+            "topic": "Query budget",
+            "doc_type": "docx",
+            "sections": [{"title": f"Section {s}", "order": s} for s in range(SECTIONS)],
+        }).json()
+
+    project_id = project["id"]
+    section_id = project["sections"][0]["id"]
+    for c in range(30):
+        client.post(f"/sections/{section_id}/comment", headers=headers, json={"text": f"Comment {c}"})
+
+    job_id = client.post(f"/projects/{project_id}/jobs", headers=headers).json()["id"]
+
+    urls = {
+        "GET /projects": "/projects",
+        "GET /projects/{id}": f"/projects/{project_id}",
+        "GET /projects/{id}/export/docx": f"/projects/{project_id}/export/docx",
+        "GET /jobs/{id}": f"/jobs/{job_id}",
+        "GET /sections/{id}/history": f"/sections/{section_id}/history",
+        "GET /sections/{id}/comments": f"/sections/{section_id}/comments",
+        "DELETE /projects/{id}": f"/projects/{project_id}",
+    }
+
+    failed = False
+    for name, url in urls.items():
+        method = name.split()[0]
+        res = client.request(method, url, headers=headers)
+        count = int(res.headers["X-SQL-Queries"])
+        ok = res.status_code == 200 and count <= BUDGETS[name]
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<32} {count:>3} queries (budget {BUDGETS[name]})")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
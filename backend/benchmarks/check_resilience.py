@@ -0,0 +1,168 @@
+# backend/benchmarks/check_resilience.py
+#
+# Exercises the LLM client's retries, Retry-After handling, circuit breaker
+# and rate limits against benchmarks/fake_gemini.py running in-process, then
+# checks that the API answers 503/429 without saving anything when Gemini is
+# down. Exits 1 if any check fails.
+#
+# Run from backend/:  python -m benchmarks.check_resilience
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks import fake_gemini
+
+server, base_url = fake_gemini.serve_in_thread()
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "resilience.db")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{DB_PATH}",
+    "LLM_BASE_URL": base_url,
+    "LLM_MAX_RETRIES": "3",
+    "LLM_BACKOFF_BASE": "0.05",
+    "LLM_BACKOFF_MAX": "2",
+    "LLM_BREAKER_FAILURES": "4",
+    "LLM_BREAKER_RESET_SECONDS": "1",
+    "LLM_USER_RATE_PER_SECOND": "0.5",
+    "LLM_USER_RATE_BURST": "3",
+    "LLM_USER_RATE_MAX_WAIT": "0.5",
+})
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import llm, migrations, models  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+
+state = fake_gemini.state
+results = []
+
+
+def check(name: str, ok: bool, detail: str = "") -> None:
+    results.append(ok)
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<48} {detail}")
+
+
+def call(user_id=None):
+    """(text or None, LLMError or None, seconds)"""
+    start = time.perf_counter()
+    try:
+        return llm.call_llm("resilience check", fresh=True, user_id=user_id), None, time.perf_counter() - start
+    except llm.LLMError as e:
+        return None, e, time.perf_counter() - start
+
+
+def reset() -> None:
+    state.reset()
+    llm.breaker.record_success()
+    llm.limiter = type(llm.limiter)(0, 1, 0, 1)  # no rate limits unless a check sets them
+
+
+def main() -> int:
+    reset()
+    text, error, _ = call()
+    check("plain call", text is not None and error is None)
+
+    reset()
+    state.fail_next = 2
+    text, error, _ = call()
+    check("retries 503s, then succeeds", text is not None and state.requests == 3, f"{state.requests} requests")
+
+    reset()
+    state.update({"fail_next": 1, "fail_status": 429, "retry_after": 1})
+    text, error, seconds = call()
+    check("honours Retry-After on 429", text is not None and seconds >= 1, f"{seconds:.2f}s")
+
+    reset()
+    state.update({"fail_next": 1, "fail_status": 429, "retry_after": 60})
+    text, error, seconds = call()
+    check(
+        "long Retry-After is passed on, not slept",
+        error is not None and error.status_code == 429 and error.retry_after == 60 and seconds < 1,
+        f"{seconds:.2f}s",
+    )
+
+    reset()
+    state.fail_next = 1
+    state.fail_status = 400
+    text, error, _ = call()
+    check("4xx is not retried", error is not None and state.requests == 1, f"{state.requests} requests")
+
+    reset()
+    state.down = True
+    text, error, _ = call()
+    check("gives up after retries", error is not None and error.status_code == 503 and state.requests == 4)
+
+    before = state.requests
+    text, error, seconds = call()
+    check(
+        "open circuit fails fast",
+        error is not None and state.requests == before and seconds < 0.05 and llm.breaker.state == "open",
+        f"{seconds * 1000:.1f} ms, retry after {error.retry_after:.2f}s" if error else "",
+    )
+
+    state.down = False
+    time.sleep(1.05)
+    text, error, _ = call()
+    check("half-open trial closes the circuit", text is not None and llm.breaker.state == "closed")
+
+    reset()
+    llm.limiter = type(llm.limiter)(0, 1, 0.5, 3)
+    outcomes = [call(user_id=1)[1] for _ in range(4)]
+    other = call(user_id=2)[1]
+    check(
+        "per-user bucket rejects with 429",
+        all(e is None for e in outcomes[:3]) and outcomes[3] is not None
+        and outcomes[3].status_code == 429 and other is None,
+    )
+
+    # A steady caller at 5x its rate gets no more than burst + rate * elapsed
+    limiter = type(llm.limiter)(0, 1, 10, 2)
+    granted, started = 0, time.perf_counter()
+    while time.perf_counter() - started < 3:
+        scope, wait = limiter.reserve(1, 0, 0.05)
+        if scope is None:
+            granted += 1
+            time.sleep(wait)
+        time.sleep(0.02)
+    allowed = 2 + 10 * (time.perf_counter() - started)
+    check("per-user rate holds under sustained load", granted <= allowed + 1, f"{granted} granted, {allowed:.0f} allowed")
+
+    # Through the API: nothing is saved when Gemini is down
+    reset()
+    migrations.migrate()
+    client = TestClient(app)
+    client.post("/auth/register", json={"email": "resilience@example.com", "password": "resilience"})
+    token = client.post(
+        "/auth/login", data={"username": "resilience@example.com", "password": "resilience"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    project = client.post("/projects", headers=headers, json={
+        "title": "Resilience", "topic": "Failures", "doc_type": "docx",
+        "sections": [{"title": "Only", "order": 0}],
+    }).json()
+    section_id = project["sections"][0]["id"]
+
+    state.down = True
+    res = client.post(f"/sections/{section_id}/refine", headers=headers, json={"prompt": "shorter"})
+    check("refine answers 503 while down", res.status_code == 503, str(res.json()))
+
+    res = client.post(f"/sections/{section_id}/refine", headers=headers, json={"prompt": "shorter"})
+    check("open circuit sends Retry-After", res.status_code == 503 and "Retry-After" in res.headers)
+
+    res = client.post(f"/projects/{project['id']}/generate", headers=headers)
+    check("generate answers 503 while down", res.status_code == 503)
+
+    db = SessionLocal()
+    section = db.get(models.Section, section_id)
+    rows = db.query(models.RefinementHistory).filter_by(section_id=section_id).count()
+    db.close()
+    check("nothing was saved", section.content is None and rows == 0)
+
+    server.should_exit = True
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
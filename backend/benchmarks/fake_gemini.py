@@ -0,0 +1,235 @@
+# backend/benchmarks/fake_gemini.py
+#
+# A local stand-in for the Gemini REST API, for exercising retries, rate
+# limits and the circuit breaker (and for load runs) without a key or
+# network. It answers generateContent and streamGenerateContent with
+# deterministic markdown-style text, and JSON-mode prompts with one entry
+# per outline line.
+#
+# Run from backend/:  python -m benchmarks.fake_gemini [--port 8090 --latency 0.2 --fail-rate 0.1]
+# then start the API with  LLM_BASE_URL=http://127.0.0.1:8090/v1
+#
+# Behaviour can be changed while it runs with POST /_control (JSON with any
+# of the State fields), and GET /_stats returns request counts.
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class State:
+    def __init__(self):
+        self.latency = 0.0          # seconds before answering (median)
+        self.distribution = "uniform"  # "uniform" (+/- 50%), "lognormal" (long tail) or "fixed"
+        self.fail_rate = 0.0        # share of requests answered with 503
+        self.rate_limit_rate = 0.0  # share of requests answered with 429
+        self.retry_after = None     # Retry-After sent with 429/503 (seconds)
+        self.fail_next = 0          # answer the next N requests with `fail_status`
+        self.fail_status = 503
+        self.down = False           # answer every request with 503
+        self.words = 220            # length of generated answers
+        self.stream_chunk_words = 8
+        self.stream_chunk_delay = 0.01
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def update(self, values: dict) -> None:
+        for key, value in values.items():
+            if not key.startswith("_") and hasattr(self, key):
+                setattr(self, key, value)
+
+    def reset(self) -> None:
+        self.__init__()
+
+    def stats(self) -> dict:
+        return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+    def next_failure(self) -> int | None:
+        """Status to fail this request with, or None to answer normally."""
+        with self._lock:
+            self.requests += 1
+            status = None
+            if self.down:
+                status = 503
+            elif self.fail_next > 0:
+                self.fail_next -= 1
+                status = self.fail_status
+            elif random.random() < self.fail_rate:
+                status = 503
+            elif random.random() < self.rate_limit_rate:
+                status = 429
+            if status is not None:
+                self.failures += 1
+            return status
+
+
+state = State()
+app = FastAPI(title="Fake Gemini")
+
+_WORDS = (
+    "system data model process result analysis method structure approach design "
+    "research value quality level practice context example framework review "
+    "performance strategy development evidence outcome principle"
+).split()
+
+
+def prompt_text(body: dict) -> str:
+    return "".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def answer(prompt: str, words: int) -> str:
+    rng = random.Random(hashlib.sha1(prompt.encode("utf-8")).digest())
+    paragraphs = ["## Overview"]
+    remaining = words
+    while remaining > 0:
+        count = min(remaining, rng.randint(30, 60))
+        text = " ".join(rng.choice(_WORDS) for _ in range(count))
+        paragraphs.append(text.capitalize() + ".")
+        remaining -= count
+    paragraphs.insert(2, "\n".join(f"* **{w}** {rng.choice(_WORDS)}" for w in rng.sample(_WORDS, 3)))
+    return "\n\n".join(paragraphs)
+
+
+def batch_answer(prompt: str, words: int) -> str:
+    outline = prompt.split("OUTLINE:", 1)[-1]
+    count = len(re.findall(r"^\d+\. ", outline, flags=re.M))
+    return json.dumps({str(i): answer(f"{prompt}\0{i}", words) for i in range(1, count + 1)})
+
+
+def candidate(text: str) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+def usage(prompt: str, text: str) -> dict:
+    # Roughly what Gemini reports, at ~4 characters per token
+    return {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4}
+
+
+def sample_latency() -> float:
+    if state.latency <= 0:
+        return 0.0
+    if state.distribution == "lognormal":
+        # Median `latency`; about 1 call in 20 takes 2.3x as long
+        return random.lognormvariate(0, 0.5) * state.latency
+    if state.distribution == "fixed":
+        return state.latency
+    return state.latency * random.uniform(0.5, 1.5)
+
+
+async def _delay() -> None:
+    delay = sample_latency()
+    if delay:
+        await asyncio.sleep(delay)
+
+
+def _failure_response(status: int) -> JSONResponse:
+    headers = {}
+    if state.retry_after is not None:
+        headers["Retry-After"] = str(state.retry_after)
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"code": status, "message": "fake failure"}},
+        headers=headers,
+    )
+
+
+@app.post("/v1/models/{target}")
+async def generate(target: str, request: Request):
+    _, _, method = target.partition(":")
+    body = await request.json()
+    prompt = prompt_text(body)
+
+    await _delay()
+    status = state.next_failure()
+    if status is not None:
+        return _failure_response(status)
+
+    if method == "generateContent":
+        json_mode = body.get("generationConfig", {}).get("responseMimeType") == "application/json"
+        text = batch_answer(prompt, state.words) if json_mode else answer(prompt, state.words)
+        return {**candidate(text), "usageMetadata": usage(prompt, text)}
+
+    if method == "streamGenerateContent":
+        words = answer(prompt, state.words).split(" ")
+        size = max(1, state.stream_chunk_words)
+
+        async def events():
+            for i in range(0, len(words), size):
+                chunk = " ".join(words[i:i + size]) + (" " if i + size < len(words) else "")
+                yield f"data: {json.dumps(candidate(chunk))}\r\n\r\n"
+                await asyncio.sleep(state.stream_chunk_delay)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return JSONResponse(status_code=404, content={"error": {"code": 404, "message": "unknown method"}})
+
+
+@app.post("/_control")
+async def control(values: dict):
+    if values.pop("reset", False):
+        state.reset()
+    state.update(values)
+    return state.stats()
+
+
+@app.get("/_stats")
+async def stats():
+    return state.stats()
+
+
+# ---------------------------------------------------
+# RUNNING
+# ---------------------------------------------------
+def serve_in_thread(port: int = 0, host: str = "127.0.0.1", asgi_app=None) -> tuple[uvicorn.Server, str]:
+    """
+    Start the fake (or `asgi_app`) in a daemon thread; returns (server, base
+    URL). For the fake, the base URL is what LLM_BASE_URL should be set to.
+    """
+    server = uvicorn.Server(uvicorn.Config(asgi_app or app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://{host}:{port}" + ("" if asgi_app else "/v1")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--distribution", choices=["uniform", "lognormal", "fixed"], default="uniform")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=None)
+    parser.add_argument("--words", type=int, default=220)
+    args = parser.parse_args()
+
+    state.update({
+        "latency": args.latency,
+        "distribution": args.distribution,
+        "fail_rate": args.fail_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "retry_after": args.retry_after,
+        "words": args.words,
+    })
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+# backend/benchmarks/load_test.py
+#
+# Offline end-to-end load test. Starts benchmarks/fake_gemini.py and the API
+# (uvicorn, in-process threads) against a fresh SQLite file, then runs
+# virtual users through register -> login -> create -> generate -> refine
+# (plain and streamed) -> read -> export, `--concurrency` at a time.
+#
+# Prints throughput and p50/p95/p99 per endpoint and writes the same as JSON
+# (--out) so runs can be diffed between versions (--compare old.json).
+#
+# Run from backend/:
+#   python -m benchmarks.load_test --users 40 --concurrency 10 --latency 0.3 --out results.json
+#   python -m benchmarks.load_test --compare results.json          # rerun and diff
+#   python -m benchmarks.load_test --api-url http://127.0.0.1:8000  # an API you started
+#
+# With --api-url, that server must already point LLM_BASE_URL at a fake
+# (python -m benchmarks.fake_gemini) or it will call the real Gemini.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks import fake_gemini
+
+PROMPTS = ["Make it shorter", "Use a more formal tone", "Add a concrete example", "Simplify the wording"]
+
+
+# ---------------------------------------------------
+# RESULTS
+# ---------------------------------------------------
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values) + 0.5 - 1e-9))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)   # endpoint -> seconds
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, endpoint: str, seconds: float, status: int | str, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][str(status)] += 1
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[endpoint] = {
+                "count": len(values),
+                "errors": self.errors[endpoint],
+                "statuses": dict(sorted(self.statuses[endpoint].items())),
+                "throughput_rps": round(len(values) / elapsed, 3),
+                "mean_ms": round(1000 * sum(values) / len(values), 2),
+                "p50_ms": round(1000 * percentile(values, 50), 2),
+                "p95_ms": round(1000 * percentile(values, 95), 2),
+                "p99_ms": round(1000 * percentile(values, 99), 2),
+                "max_ms": round(1000 * values[-1], 2),
+            }
+        requests = sum(e["count"] for name, e in endpoints.items() if not name.endswith("(first event)"))
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "requests": requests,
+            "errors": sum(self.errors.values()),
+            "throughput_rps": round(requests / elapsed, 3),
+            "endpoints": endpoints,
+        }
+
+
+# ---------------------------------------------------
+# SCENARIO
+# ---------------------------------------------------
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, index: int, args):
+        self.client = client
+        self.recorder = recorder
+        self.index = index
+        self.args = args
+        self.rng = random.Random(args.seed * 100003 + index)
+        self.headers = {}
+
+    async def call(
+        self, endpoint: str, method: str, url: str, ok_statuses=(200,), headers=None, **kwargs
+    ) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            res = await self.client.request(method, url, headers={**self.headers, **(headers or {})}, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(endpoint, time.perf_counter() - start, type(e).__name__, False)
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - start, res.status_code, res.status_code in ok_statuses)
+        return res if res.status_code in ok_statuses else None
+
+    async def stream(self, endpoint: str, url: str, body: dict) -> None:
+        # Total time, plus time to the first event (what the user waits for)
+        start = time.perf_counter()
+        first = None
+        status, ok = None, False
+        try:
+            async with self.client.stream("POST", url, headers=self.headers, json=body) as res:
+                status = res.status_code
+                event = None
+                async for line in res.aiter_lines():
+                    if first is None and line:
+                        first = time.perf_counter() - start
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                ok = status == 200 and event == "done"
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        self.recorder.record(endpoint, elapsed, status if ok or status != 200 else "error event", ok)
+        if first is not None:
+            self.recorder.record(f"{endpoint} (first event)", first, status, ok)
+
+    async def run(self) -> None:
+        args = self.args
+        email = f"load{self.index}-{args.run_id}@example.com"
+        password = "load-test-password"
+
+        if not await self.call("POST /auth/register", "POST", "/auth/register",
+                               json={"email": email, "password": password}):
+            return
+        res = await self.call("POST /auth/login", "POST", "/auth/login",
+                              data={"username": email, "password": password})
+        if res is None:
+            return
+        self.headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+        for p in range(args.projects):
+            # Topics differ per user and run, so the LLM response cache does
+            # not answer in Gemini's place
+            topic = self.rng.choice(["Renewable energy", "Machine learning", "Urban planning"])
+            res = await self.call("POST /projects", "POST", "/projects", json={
+                "title": f"Load test {self.index}.{p}",
+                "topic": f"{topic} ({args.run_id}.{self.index}.{p})",
+                "doc_type": "docx",
+                "sections": [{"title": f"Section {i + 1}", "order": i} for i in range(args.sections)],
+            })
+            if res is None:
+                continue
+            project = res.json()
+            project_id = project["id"]
+            section_ids = [s["id"] for s in project["sections"]]
+
+            await self.call("POST /projects/{id}/generate", "POST", f"/projects/{project_id}/generate")
+
+            for r in range(args.refines):
+                section_id = self.rng.choice(section_ids)
+                prompt = f"{self.rng.choice(PROMPTS)} (pass {r + 1})"
+                await self.call("POST /sections/{id}/refine", "POST", f"/sections/{section_id}/refine",
+                                json={"prompt": prompt})
+
+            if args.stream:
+                await self.stream("POST /sections/{id}/refine/stream",
+                                  f"/sections/{self.rng.choice(section_ids)}/refine/stream",
+                                  {"prompt": "Tighten the argument"})
+
+            await self.call("GET /projects/{id}", "GET", f"/projects/{project_id}")
+            await self.call("GET /sections/{id}/history", "GET", f"/sections/{section_ids[0]}/history")
+
+            res = await self.call("GET /projects/{id}/export/docx", "GET", f"/projects/{project_id}/export/docx")
+            if res is not None and res.headers.get("etag"):
+                await self.call("GET /projects/{id}/export/docx (304)", "GET",
+                                f"/projects/{project_id}/export/docx", ok_statuses=(304,),
+                                headers={"If-None-Match": res.headers["etag"]})
+
+        await self.call("GET /projects", "GET", "/projects")
+
+
+async def run_load(api_url: str, args) -> Recorder:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=timeout) as client:
+        async def one(index: int) -> None:
+            async with semaphore:
+                await VirtualUser(client, recorder, index, args).run()
+
+        await asyncio.gather(*(one(i) for i in range(args.users)))
+
+    recorder.finished = time.perf_counter()
+    return recorder
+
+
+# ---------------------------------------------------
+# REPORTING
+# ---------------------------------------------------
+def print_table(summary: dict) -> None:
+    print(f"\n{'endpoint':<52} {'count':>6} {'err':>4} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, e in summary["endpoints"].items():
+        print(f"{name:<52} {e['count']:>6} {e['errors']:>4} {e['throughput_rps']:>7.2f} "
+              f"{e['p50_ms']:>9.1f} {e['p95_ms']:>9.1f} {e['p99_ms']:>9.1f}")
+    print(f"\n{summary['requests']} requests, {summary['errors']} errors in {summary['elapsed_s']:.1f}s "
+          f"({summary['throughput_rps']:.1f} req/s)")
+
+
+def print_comparison(baseline: dict, summary: dict) -> None:
+    print(f"\nvs {baseline['meta'].get('git_commit') or 'baseline'} "
+          f"({baseline['meta'].get('started', '?')}); negative is faster")
+    print(f"{'endpoint':<52} {'p50':>16} {'p95':>16} {'p99':>16}")
+    for name, e in summary["endpoints"].items():
+        old = baseline["summary"]["endpoints"].get(name)
+        if old is None:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            change = (e[key] - old[key]) / old[key] if old[key] else 0.0
+            cells.append(f"{e[key] - old[key]:+8.1f} ({change:+5.0%})")
+        print(f"{name:<52} " + " ".join(f"{c:>16}" for c in cells))
+    old_rps = baseline["summary"]["throughput_rps"]
+    print(f"throughput {old_rps:.1f} -> {summary['throughput_rps']:.1f} req/s")
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------------------------------------------------
+# MAIN
+# ---------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20, help="virtual users (each runs the scenario once)")
+    parser.add_argument("--concurrency", type=int, default=5, help="users running at the same time")
+    parser.add_argument("--projects", type=int, default=1, help="projects per user")
+    parser.add_argument("--sections", type=int, default=5, help="sections per project")
+    parser.add_argument("--refines", type=int, default=3, help="refinements per project")
+    parser.add_argument("--no-stream", dest="stream", action="store_false", help="skip the streamed refine")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    # Fake Gemini
+    parser.add_argument("--latency", type=float, default=0.2, help="median Gemini latency (s)")
+    parser.add_argument("--distribution", choices=["uniform", "lognormal", "fixed"], default="lognormal")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of Gemini calls answered 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share answered 429")
+    parser.add_argument("--words", type=int, default=220, help="words per generated answer")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.01)
+    # API
+    parser.add_argument("--api-url", help="load an already running API instead of starting one")
+    parser.add_argument("--database-url", help="for the started API (default: a fresh SQLite file)")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON from an earlier run to diff against")
+    return parser.parse_args()
+
+
+def start_api(args, llm_base_url: str) -> str:
+    db_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+    os.environ.update({
+        "DATABASE_URL": db_url,
+        "LLM_BASE_URL": llm_base_url,
+        "LLM_API_KEY": "load-test",
+        # The client-side limits would otherwise throttle the run, not Gemini
+        "LLM_RATE_PER_SECOND": os.environ.get("LLM_RATE_PER_SECOND", "0"),
+        "LLM_USER_RATE_PER_SECOND": os.environ.get("LLM_USER_RATE_PER_SECOND", "0"),
+    })
+    from app.main import app  # noqa: E402 - reads the settings above at import
+
+    _, api_url = fake_gemini.serve_in_thread(asgi_app=app)
+    return api_url
+
+
+def main() -> int:
+    args = parse_args()
+    args.run_id = f"{int(time.time())}{random.randrange(1000):03d}"
+
+    fake_server, llm_base_url = fake_gemini.serve_in_thread()
+    fake_gemini.state.update({
+        "latency": args.latency,
+        "distribution": args.distribution,
+        "fail_rate": args.fail_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "words": args.words,
+        "stream_chunk_delay": args.stream_chunk_delay,
+    })
+    api_url = args.api_url or start_api(args, llm_base_url)
+
+    meta = {
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "api_url": api_url if args.api_url else "in-process",
+        "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "run_id")},
+    }
+    print(f"{args.users} users, {args.concurrency} at a time, Gemini latency {args.latency}s ({args.distribution})")
+
+    recorder = asyncio.run(run_load(api_url, args))
+    summary = recorder.summary()
+    stats = fake_gemini.state.stats()
+    print_table(summary)
+    print(f"fake Gemini: {stats['requests']} calls, {stats['failures']} failed on purpose")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), summary)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"meta": meta, "summary": summary, "fake_gemini": stats}, f, indent=2)
+        print(f"results written to {args.out}")
+
+    fake_server.should_exit = True
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())